@@ -0,0 +1,179 @@
+"""Async counterparts of the crud.py functions for the async def endpoints.
+
+Each wrapper runs the matching crud function through crud.run_db: on an AsyncSession
+that is AsyncSession.run_sync (asyncpg I/O via SQLAlchemy's greenlet bridge), on a plain
+Session it is the threadpool. The query logic itself stays in crud.py.
+"""
+from typing import List, Optional
+import crud
+import hashing
+import search
+import typeahead
+from crud import run_db
+from loader import get_loader
+from task_forest import task_forest_cache
+from models import Milestone, Project, Task, TaskList
+from database import DBSession
+from schemas import *
+
+
+# Users
+async def get_user(db: DBSession, email: str):
+    return await run_db(db, crud.get_user, email)
+
+async def get_user_by_username(db: DBSession, username: str):
+    return await run_db(db, crud.get_user_by_username, username)
+
+async def create_user(db: DBSession, user: UserCreate):
+    hashed_password = await hashing.hash_password(user.password)
+    return await run_db(db, crud.create_user, user, hashed_password)
+
+async def authenticate_user(db: DBSession, email: str, password: str):
+    user = await get_user(db, email)
+    if not user:
+        return None
+    if not await hashing.check_password(password, user.hashed_password):
+        return None
+    return user
+
+
+# Projects
+async def get_projects_by_owner(db: DBSession, owner_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, expand_tasks: bool = False):
+    return await run_db(db, crud.get_projects_by_owner, owner_id, limit=limit, after_id=after_id, expand_tasks=expand_tasks)
+
+async def get_owned_project(db: DBSession, project_id: int, owner_id: int):
+    return await run_db(db, crud.get_owned_project, project_id, owner_id)
+
+# Single-row lookups go through the request's Loader: concurrent calls share one IN query
+# and rows the session already holds are not fetched again.
+async def get_project(db: DBSession, project_id: int):
+    return await get_loader(db).load(Project, project_id)
+
+async def create_project(db: DBSession, project: ProjectCreate, owner_id: int):
+    return await run_db(db, crud.create_project, project, owner_id)
+
+async def update_project(db: DBSession, db_project, project: ProjectCreate):
+    return await run_db(db, crud.update_project, db_project, project)
+
+async def delete_project(db: DBSession, db_project):
+    return await run_db(db, crud.delete_project, db_project)
+
+
+# Milestones
+async def get_milestone(db: DBSession, milestone_id: int):
+    return await get_loader(db).load(Milestone, milestone_id, MilestoneResponse)
+
+async def get_milestone_etag_versions(db: DBSession, project_id: int, milestone_id: int):
+    return await run_db(db, crud.get_milestone_etag_versions, project_id, milestone_id)
+
+async def get_milestones_by_project(db: DBSession, project_id: int, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return await run_db(db, crud.get_milestones_by_project, project_id, skip=skip, limit=limit, after_id=after_id)
+
+async def create_milestone(db: DBSession, milestone: MilestoneCreate):
+    return await run_db(db, crud.create_milestone, milestone)
+
+async def update_milestone(db: DBSession, db_milestone, milestone_update: MilestoneUpdate):
+    return await run_db(db, crud.update_milestone, db_milestone, milestone_update)
+
+async def delete_milestone(db: DBSession, milestone_id: int):
+    return await run_db(db, crud.delete_milestone, milestone_id)
+
+
+# Task lists
+async def get_tasklist(db: DBSession, tasklist_id: int):
+    return await get_loader(db).load(TaskList, tasklist_id, TaskListResponse)
+
+async def get_tasklist_etag_versions(db: DBSession, project_id: int, tasklist_id: int):
+    return await run_db(db, crud.get_tasklist_etag_versions, project_id, tasklist_id)
+
+async def get_tasklists(db: DBSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return await run_db(db, crud.get_tasklists, skip=skip, limit=limit, after_id=after_id)
+
+async def get_tasklists_by_project(db: DBSession, project_id: int, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return await run_db(db, crud.get_tasklists_by_project, project_id, skip=skip, limit=limit, after_id=after_id)
+
+async def create_tasklist(db: DBSession, tasklist: TaskListCreate):
+    return await run_db(db, crud.create_tasklist, tasklist)
+
+async def delete_tasklist(db: DBSession, tasklist_id: int):
+    return await run_db(db, crud.delete_tasklist, tasklist_id)
+
+
+# Tasks
+async def get_task(db: DBSession, project_id: int, task_id: int):
+    task = await get_loader(db).load(Task, task_id)
+    return task if task is not None and task.project_id == project_id else None
+
+async def get_task_version(db: DBSession, project_id: int, task_id: int):
+    return await run_db(db, crud.get_task_version, project_id, task_id)
+
+async def get_project_tasks_version(db: DBSession, project_id: int):
+    return await run_db(db, crud.get_project_tasks_version, project_id)
+
+async def get_task_forest(db: DBSession, project_id: int, version: int):
+    """The project's forest at version (or newer), from the cache or rebuilt with one query."""
+    forest = await task_forest_cache.get(project_id, version)
+    if forest is None:
+        forest = await run_db(db, crud.load_task_forest, project_id)
+        if forest is not None:
+            await task_forest_cache.set(project_id, forest)
+    return forest
+
+async def get_task_tree(db: DBSession, project_id: int, task_id: int, depth: Optional[int] = None, max_nodes: int = crud.DEFAULT_TREE_MAX_NODES):
+    return await run_db(db, crud.get_task_tree, project_id, task_id, depth=depth, max_nodes=max_nodes)
+
+async def create_task(db: DBSession, task_name: str, task_details: str, project_id: int, root_task_id: Optional[int] = None):
+    return await run_db(db, crud.create_task, task_name, task_details, project_id, root_task_id)
+
+async def bulk_create_tasks(db: DBSession, project_id: int, items: List[BulkTaskItem]):
+    return await run_db(db, crud.bulk_create_tasks, project_id, items)
+
+async def update_task(db: DBSession, project_id: int, task_id: int, task_name: Optional[str] = None, task_details: Optional[str] = None, root_task_id: Optional[int] = None):
+    return await run_db(db, crud.update_task, project_id, task_id, task_name, task_details, root_task_id)
+
+async def delete_task(db: DBSession, project_id: int, task_id: int):
+    return await run_db(db, crud.delete_task, project_id, task_id)
+
+
+# Comments
+async def get_task_comments(db: DBSession, task_id: int):
+    return await run_db(db, crud.get_task_comments, task_id)
+
+async def get_task_comments_version(db: DBSession, task_id: int):
+    return await run_db(db, crud.get_task_comments_version, task_id)
+
+async def create_comment(db: DBSession, comment_create: str, type_id: int, type_name: str):
+    return await run_db(db, crud.create_comment, comment_create, type_id, type_name)
+
+async def get_comments_for_tasks(db: DBSession, project_id: int, task_ids: List[int]):
+    return await run_db(db, crud.get_comments_for_tasks, project_id, task_ids)
+
+async def count_comments_for_tasks(db: DBSession, project_id: int, task_ids: List[int]):
+    return await run_db(db, crud.count_comments_for_tasks, project_id, task_ids)
+
+async def bulk_create_comments(db: DBSession, project_id: int, items: List[BulkCommentItem]):
+    return await run_db(db, crud.bulk_create_comments, project_id, items)
+
+
+# Search
+async def full_text_search(db: DBSession, owner_id: int, query: str, project_id: Optional[int] = None, skip: int = 0, limit: int = search.DEFAULT_SEARCH_LIMIT):
+    return await run_db(db, search.search, owner_id, query, project_id=project_id, skip=skip, limit=limit)
+
+
+# Typeahead
+async def typeahead_tasks(db: DBSession, project_id: int, prefix: str, limit: int = typeahead.DEFAULT_TYPEAHEAD_LIMIT):
+    """Tasks whose name starts with prefix; None if the project does not exist."""
+    if not typeahead.TYPEAHEAD_CACHE_ENABLED:
+        if await get_project_tasks_version(db, project_id) is None:
+            return None
+        return await run_db(db, typeahead.lookup_tasks, project_id, prefix, limit)
+    version = await get_project_tasks_version(db, project_id)
+    if version is None:
+        return None
+    forest = await get_task_forest(db, project_id, version)
+    if forest is None:
+        return None
+    return typeahead.prefix_index_cache.get(project_id, forest).lookup(prefix, limit)
+
+async def typeahead_projects(db: DBSession, owner_id: int, prefix: str, limit: int = typeahead.DEFAULT_TYPEAHEAD_LIMIT):
+    return await run_db(db, typeahead.lookup_projects, owner_id, prefix, limit)
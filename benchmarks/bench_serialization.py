@@ -0,0 +1,108 @@
+"""Serialization throughput for deep task trees and large project lists.
+
+    python -m benchmarks.bench_serialization --depth 6 --fanout 4 --projects 500
+
+Every payload goes through the same validation against its response schema; the
+encoders differ in what happens afterwards:
+
+  jsonable_encoder   validate, jsonable_encoder, stdlib json (routes without response_model)
+  JSONResponse       validate, dump to Python objects, stdlib json (FastAPI's default)
+  ORJSONResponse     validate, dump to Python objects, orjson (the app's default class now)
+  model_response     validate, pydantic-core writes the bytes (json_responses.model_response)
+"""
+import argparse
+import itertools
+import time
+from datetime import date
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import models
+from json_responses import model_response, type_adapter
+from schemas import ProjectSummary, TaskResponse
+
+
+def task_tree(depth: int, fanout: int):
+    ids = itertools.count(1)
+
+    def node(parent_id, level):
+        task_id = next(ids)
+        return {
+            "id": task_id, "task_name": f"task {task_id}", "task_details": "details " * 8,
+            "project_id": 1, "root_task_id": parent_id,
+            "subtasks": [node(task_id, level + 1) for _ in range(fanout)] if level < depth else [],
+        }
+    return node(None, 0), next(ids) - 1
+
+
+def task_chain(length: int):
+    tree = None
+    for task_id in range(length, 0, -1):
+        tree = {"id": task_id, "task_name": f"task {task_id}", "task_details": "", "project_id": 1,
+                "root_task_id": task_id - 1 or None, "subtasks": [tree] if tree else []}
+    return tree
+
+
+def project_list(count: int):
+    return [
+        models.Project(id=i, projectname=f"project {i}", description="description " * 4, due_date=date(2024, 1, 1), owner_id=1)
+        for i in range(1, count + 1)
+    ]
+
+
+def encoders(schema):
+    adapter = type_adapter(schema)
+
+    def validated(content):
+        return adapter.validate_python(content, from_attributes=True)
+
+    return {
+        "jsonable_encoder": lambda content: JSONResponse(jsonable_encoder(validated(content))).body,
+        "JSONResponse": lambda content: JSONResponse(adapter.dump_python(validated(content), mode="json")).body,
+        "ORJSONResponse": lambda content: ORJSONResponse(adapter.dump_python(validated(content), mode="json")).body,
+        "model_response": lambda content: model_response(schema, content).body,
+    }
+
+
+def measure(fn, content, min_seconds):
+    size = len(fn(content))
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn(content)
+        runs += 1
+    elapsed = (time.perf_counter() - start) / runs
+    return elapsed * 1000, size / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization.")
+    parser.add_argument("--depth", type=int, default=6, help="levels below the root of the bushy tree")
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--chain", type=int, default=200, help="length of the single-path tree (pydantic stops at ~255 levels)")
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=1.0, help="minimum time per measurement")
+    args = parser.parse_args()
+
+    tree, nodes = task_tree(args.depth, args.fanout)
+    payloads = [
+        (f"task tree ({nodes} nodes)", TaskResponse, tree),
+        (f"task chain ({args.chain} deep)", TaskResponse, task_chain(args.chain)),
+        (f"project list ({args.projects})", List[ProjectSummary], project_list(args.projects)),
+    ]
+    print(f"{'payload':<28}{'encoder':<18}{'ms/response':>12}{'MB/s':>10}")
+    for label, schema, content in payloads:
+        for name, fn in encoders(schema).items():
+            try:
+                ms, throughput = measure(fn, content, args.seconds)
+            except (TypeError, ValueError) as exc:
+                # orjson refuses documents nested deeper than 255 levels (about 127 task levels).
+                print(f"{label:<28}{name:<18}{'failed: ' + str(exc):>22}")
+                continue
+            print(f"{label:<28}{name:<18}{ms:>12.2f}{throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Cold-start cost of a worker: importing main, with and without the old create_all.
+
+    python -m benchmarks.bench_startup --runs 10
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_startup
+
+Each run imports main in a fresh interpreter, the way a uvicorn worker boots. "import"
+is the current path (no database access); "import+create_all" adds the metadata
+reflection main.py used to do at import time. The database is migrated to head first.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_startup.db")
+
+import migrations
+from database import engine
+
+SNIPPETS = {
+    "import": "import main",
+    "import+create_all": "import main, models; models.Base.metadata.create_all(bind=main.engine)",
+}
+
+
+def time_runs(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True, env=os.environ)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker startup.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    migrations.upgrade(engine, log=lambda message: None)
+    for name, code in SNIPPETS.items():
+        timings = time_runs(code, args.runs)
+        print(f"{name:<20} median {statistics.median(timings):8.1f} ms   min {min(timings):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
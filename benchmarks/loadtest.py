@@ -0,0 +1,302 @@
+"""HTTP load test with per-route latency, throughput and error rates as JSON.
+
+    python -m benchmarks.loadtest --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --rate 200 --duration 30 --mix get_task=5,create_comment=1
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --output run.json
+
+Without --base-url, main.app is served in-process through httpx's ASGITransport against
+a throwaway SQLite database migrated to head (set DATABASE_URL to point elsewhere). The
+harness seeds its own users, projects, milestones, task lists, tasks and comments over
+HTTP, so it works the same against a deployed server.
+
+--concurrency runs a closed loop: N workers each send the next request as soon as the
+previous one returns. --rate runs an open loop: requests start on a fixed schedule
+whatever the latency, and latency is measured from the scheduled start, so a stalled
+server shows up as queueing delay instead of as fewer samples.
+
+Compare runs by diffing the JSON: per route, requests, errors (non-2xx/304 responses
+and transport failures), error_rate, rps and p50/p95/p99/max latency in milliseconds.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/loadtest.db")
+
+PASSWORD = "loadtest-password"
+
+# Operation name -> (relative weight in the default mix, route label used in the report).
+OPERATIONS = {
+    "token": (1, "POST /token"),
+    "list_projects": (4, "GET /projects/"),
+    "list_milestones": (3, "GET /projects/{project_id}/milestones/"),
+    "get_milestone": (4, "GET /projects/{project_id}/milestones/{milestone_id}"),
+    "list_tasklists": (3, "GET /projects/{project_id}/tasklists/"),
+    "get_tasklist": (4, "GET /projects/{project_id}/tasklists/{tasklist_id}"),
+    "get_task": (10, "GET /projects/{project_id}/tasks/{task_id}"),
+    "create_task": (2, "POST /projects/{project_id}/tasks/"),
+    "update_task": (2, "PUT /projects/{project_id}/tasks/{task_id}"),
+    "list_comments": (6, "GET /projects/{project_id}/tasks/{task_id}/comments"),
+    "create_comment": (2, "POST /projects/{project_id}/tasks/{task_id}/comments"),
+}
+
+
+def parse_mix(value):
+    if not value:
+        return {name: weight for name, (weight, _) in OPERATIONS.items()}
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Fixture:
+    """Ids created by seed(), per user, for the operations to pick from."""
+
+    def __init__(self):
+        self.users = []  # dicts: email, headers, projects -> {id, milestones, tasklists, tasks}
+
+    def pick(self, rng):
+        user = rng.choice(self.users)
+        return user, rng.choice(user["projects"])
+
+
+def check(response, expected=(200,)):
+    if response.status_code not in expected:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response.json()
+
+
+async def seed(client, args, rng) -> Fixture:
+    fixture = Fixture()
+    run = f"{os.getpid()}-{int(time.time())}"
+    for u in range(args.users):
+        email = f"load-{run}-{u}@example.com"
+        check(await client.post("/register/", json={"email": email, "phonenumber": str(u), "username": f"load-{run}-{u}", "password": PASSWORD}))
+        token = check(await client.post("/token", params={"email": email, "password": PASSWORD}))["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        user = {"email": email, "headers": headers, "projects": []}
+        for p in range(args.projects):
+            project_id = check(await client.post("/projects/", headers=headers, json={
+                "projectname": f"project {u}.{p}", "description": "load test", "due_date": "2030-01-01",
+            }))["id"]
+            project = {"id": project_id, "milestones": [], "tasklists": [], "tasks": []}
+            for m in range(args.milestones):
+                milestone_id = check(await client.post(f"/projects/{project_id}/milestones/", headers=headers, json={
+                    "milestone_name": f"milestone {m}", "start_date": "2030-01-01", "end_date": "2030-02-01", "project_id": project_id,
+                }))["id"]
+                project["milestones"].append(milestone_id)
+                tasklist_id = check(await client.post(f"/projects/{project_id}/tasklists/", headers=headers, json={
+                    "task_name": f"list {m}", "milestone_id": milestone_id, "project_id": project_id,
+                }))["id"]
+                project["tasklists"].append(tasklist_id)
+            for t in range(args.tasks):
+                # Roughly a third of the tasks hang under an earlier one, so task reads return small trees.
+                parent = rng.choice(project["tasks"]) if project["tasks"] and rng.random() < 0.33 else None
+                task_id = check(await client.post(f"/projects/{project_id}/tasks/", headers=headers, json={
+                    "task_name": f"task {t}", "task_details": "seeded by the load test", "root_task_id": parent,
+                }))["id"]
+                project["tasks"].append(task_id)
+                for c in range(args.comments):
+                    check(await client.post(f"/projects/{project_id}/tasks/{task_id}/comments", headers=headers, params={"commentcreate": f"comment {c}"}))
+            user["projects"].append(project)
+        fixture.users.append(user)
+    return fixture
+
+
+async def send(client, name, fixture, rng):
+    user, project = fixture.pick(rng)
+    headers, project_id = user["headers"], project["id"]
+    if name == "token":
+        return await client.post("/token", params={"email": user["email"], "password": PASSWORD})
+    if name == "list_projects":
+        return await client.get("/projects/", headers=headers, params={"limit": 20})
+    if name == "list_milestones":
+        return await client.get(f"/projects/{project_id}/milestones/", headers=headers)
+    if name == "get_milestone":
+        return await client.get(f"/projects/{project_id}/milestones/{rng.choice(project['milestones'])}", headers=headers)
+    if name == "list_tasklists":
+        return await client.get(f"/projects/{project_id}/tasklists/", headers=headers)
+    if name == "get_tasklist":
+        return await client.get(f"/projects/{project_id}/tasklists/{rng.choice(project['tasklists'])}", headers=headers)
+    if name == "get_task":
+        return await client.get(f"/projects/{project_id}/tasks/{rng.choice(project['tasks'])}", headers=headers)
+    if name == "create_task":
+        return await client.post(f"/projects/{project_id}/tasks/", headers=headers, json={"task_name": "load task", "task_details": ""})
+    if name == "update_task":
+        task_id = rng.choice(project["tasks"])
+        return await client.put(f"/projects/{project_id}/tasks/{task_id}", headers=headers, json={"task_name": f"task {task_id} v{rng.randrange(1000)}", "task_details": "updated by the load test"})
+    if name == "list_comments":
+        return await client.get(f"/projects/{project_id}/tasks/{rng.choice(project['tasks'])}/comments", headers=headers)
+    if name == "create_comment":
+        return await client.post(f"/projects/{project_id}/tasks/{rng.choice(project['tasks'])}/comments", headers=headers, params={"commentcreate": "load comment"})
+    raise ValueError(name)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def record(self, route, started, status):
+        if not self.recording:
+            return
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        self.status_codes[route][str(status)] += 1
+        if not (200 <= status < 300 or status == 304):
+            self.errors[route] += 1
+
+    def report(self, elapsed):
+        routes = {}
+        for route in sorted(self.latencies):
+            samples = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(samples),
+                "errors": self.errors[route],
+                "error_rate": round(self.errors[route] / len(samples), 4),
+                "rps": round(len(samples) / elapsed, 2),
+                "latency_ms": {
+                    "p50": percentile(samples, 50), "p95": percentile(samples, 95), "p99": percentile(samples, 99),
+                    "mean": round(sum(samples) / len(samples), 3), "max": round(samples[-1], 3),
+                },
+                "status_codes": dict(self.status_codes[route]),
+            }
+        total = sum(route["requests"] for route in routes.values())
+        errors = sum(route["errors"] for route in routes.values())
+        return {
+            "total": {"requests": total, "errors": errors, "error_rate": round(errors / total, 4) if total else 0.0, "rps": round(total / elapsed, 2)},
+            "routes": routes,
+        }
+
+
+def percentile(samples, pct):
+    # Nearest-rank on sorted samples.
+    return round(samples[max(math.ceil(pct / 100 * len(samples)) - 1, 0)], 3)
+
+
+async def timed(client, name, fixture, rng, recorder, started):
+    route = OPERATIONS[name][1]
+    try:
+        response = await send(client, name, fixture, rng)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    recorder.record(route, started, status)
+
+
+async def closed_loop(client, fixture, names, weights, args, recorder, deadline):
+    async def worker(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            await timed(client, rng.choices(names, weights)[0], fixture, rng, recorder, time.perf_counter())
+
+    await asyncio.gather(*(worker(args.seed + n) for n in range(args.concurrency)))
+
+
+async def open_loop(client, fixture, names, weights, args, recorder, deadline):
+    rng = random.Random(args.seed)
+    interval = 1 / args.rate
+    in_flight = set()
+    start = time.perf_counter()
+    for n in itertools.count():
+        scheduled = start + n * interval
+        if scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= args.max_in_flight:
+            # The client cannot keep up; count the dropped arrival as an error on the route.
+            recorder.record(OPERATIONS[rng.choices(names, weights)[0]][1], scheduled, 0)
+            continue
+        task = asyncio.create_task(timed(client, rng.choices(names, weights)[0], fixture, random.Random(rng.random()), recorder, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+def make_client(args):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout)
+    import migrations
+    from database import engine
+    from main import app
+    migrations.upgrade(engine, log=lambda message: None)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load-test the API and report per-route latency.")
+    parser.add_argument("--base-url", help="server to test; default is main.app in-process on a throwaway SQLite database")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=16, help="closed loop: number of concurrent workers")
+    load.add_argument("--rate", type=float, help="open loop: requests started per second")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open loop: arrivals beyond this many outstanding requests are dropped")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(None), help=f"name=weight,... from: {', '.join(OPERATIONS)}")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--projects", type=int, default=2, help="per user")
+    parser.add_argument("--milestones", type=int, default=3, help="per project, each with one task list")
+    parser.add_argument("--tasks", type=int, default=20, help="per project")
+    parser.add_argument("--comments", type=int, default=2, help="per task")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names, weights = list(args.mix), list(args.mix.values())
+    run = closed_loop if args.rate is None else open_loop
+    async with make_client(args) as client:
+        fixture = await seed(client, args, rng)
+        recorder = Recorder()
+        if args.warmup > 0:
+            await run(client, fixture, names, weights, args, recorder, time.perf_counter() + args.warmup)
+        recorder.recording = True
+        start = time.perf_counter()
+        await run(client, fixture, names, weights, args, recorder, start + args.duration)
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "config": {
+            "target": args.base_url or "asgi:main.app", "database": None if args.base_url else os.environ["DATABASE_URL"],
+            "mode": "rate" if args.rate is not None else "concurrency",
+            "concurrency": None if args.rate is not None else args.concurrency, "rate": args.rate,
+            "duration_s": round(elapsed, 3), "mix": args.mix, "seed": args.seed,
+            "fixture": {"users": args.users, "projects": args.projects, "milestones": args.milestones, "tasks": args.tasks, "comments": args.comments},
+        },
+        **recorder.report(elapsed),
+    }
+    print(f"{'route':<56}{'req':>7}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}", file=sys.stderr)
+    for route, stats in report["routes"].items():
+        latency = stats["latency_ms"]
+        print(f"{route:<56}{stats['requests']:>7}{stats['error_rate'] * 100:>7.1f}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
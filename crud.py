@@ -1,29 +1,70 @@
-from sqlalchemy.orm import Session,joinedload
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import get_args
+from sqlalchemy import select, insert, update, delete, func, inspect, literal, true
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 from models import Project, User, Task, Milestone, TaskList
-from models import User, Project, Milestone, TaskList,Comment
+from models import User, Project, Milestone, TaskList,Comment, TaskClosure
 from datetime import datetime, timedelta
-from database import SessionLocal
-from passlib.context import CryptContext
+from database import SessionLocal, AsyncSessionLocal, USE_ASYNC_DB
+from hashing import pwd_context
 from fastapi.security import OAuth2PasswordBearer,APIKeyHeader
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from schemas import *
+from user_cache import user_cache, user_snapshot
+from ttl_cache import TTLCache
+import task_forest
+import search
+import profiler
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# When enabled, hierarchy lookups are answered from the task_closure table instead of a
+# recursive walk. Task writes keep task_closure current whether or not the flag is set, so
+# a single scripts/backfill_task_closure.py run (for rows written before the table
+# existed) is all that is needed before switching it on, and it can be flipped back and
+# forth afterwards without another backfill.
+TASK_CLOSURE_ENABLED = os.getenv("TASK_CLOSURE_ENABLED", "false").lower() in ("1", "true", "yes")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 api_key_scheme = APIKeyHeader(name='Authorization')
 
-def get_db():
+@asynccontextmanager
+async def session_scope():
+    if USE_ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+async def get_db():
+    async with session_scope() as db:
+        yield db
+
+async def run_db(db, fn, *args, **kwargs):
+    # Run a sync crud function without blocking the event loop: through the greenlet bridge
+    # for an AsyncSession (asyncpg does the I/O), or in the threadpool for a plain Session.
+    if profiler.SQL_PROFILE_ENABLED:
+        fn = profiler.attributed(fn)
+    try:
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    finally:
+        await user_cache.flush_invalidations(db)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
@@ -41,9 +82,32 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Verified claims keyed by a SHA-256 of the raw token; each entry expires with the token's exp.
+token_cache = TTLCache(TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_access_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if claims.get("exp") is not None:
+            token_cache.set(key, claims, ttl=claims["exp"] - time.time())
+    return claims
+
 def get_user(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
+def get_user_by_username(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def create_user(db: Session, user: UserCreate, hashed_password: str):
+    db_user = models.User(email=user.email, phonenumber=user.phonenumber, username=user.username, hashed_password=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user(db, email)
     if not user:
@@ -59,38 +123,181 @@ async def get_current_user(token: str = Depends(api_key_scheme), db: Session = D
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token.split(" ")[1], SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token.split(" ")[1])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, email=token_data.email)
+    # Served from the user cache when possible; the returned User is then a detached copy.
+    cached = await user_cache.get(token_data.email)
+    if cached is not None:
+        return models.User(**cached)
+    user = await run_db(db, get_user, email=token_data.email)
     if user is None:
         raise credentials_exception
+    await user_cache.set(token_data.email, user_snapshot(user))
     return user
 
+def nested_schema(annotation):
+    # Optional[X], List[X] and X all resolve to X when X is a pydantic model.
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        schema = nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+@lru_cache(maxsize=None)
+def response_load_options(model, schema, _path=()):
+    """Loader options for every relationship the response schema serializes.
+
+    Collections get selectinload (one extra IN query per level, no row multiplication),
+    many-to-one relationships get joinedload (no extra round trip), recursively down the
+    nested schemas. A (model, schema) pair already on the path, e.g. TaskResponse.subtasks,
+    is not followed again.
+    """
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.model_fields.items():
+        relationship = relationships.get(name)
+        child_schema = nested_schema(field.annotation)
+        if relationship is None or child_schema is None:
+            continue
+        child_model = relationship.mapper.class_
+        if (child_model, child_schema) in _path:
+            continue
+        loader = (selectinload if relationship.uselist else joinedload)(getattr(model, name))
+        nested = response_load_options(child_model, child_schema, _path + ((model, schema),))
+        options.append(loader.options(*nested) if nested else loader)
+    return tuple(options)
+
+# Relationships the response schemas read, loaded together with the rows so serializing a
+# response never lazy-loads (an AsyncSession cannot lazy-load outside run_sync at all).
+# scripts/check_query_counts.py keeps the list endpoints at a constant number of statements.
+PROJECT_RESPONSE_LOAD = response_load_options(Project, ProjectResponse)
+MILESTONE_RESPONSE_LOAD = response_load_options(Milestone, MilestoneResponse)
+TASKLIST_RESPONSE_LOAD = response_load_options(TaskList, TaskListResponse)
+
+def is_loaded(obj, schema, _path=()) -> bool:
+    """True if obj can be serialized with schema without touching the database."""
+    state = inspect(obj)
+    if state.expired_attributes:
+        return False
+    relationships = state.mapper.relationships
+    for name, field in schema.model_fields.items():
+        relationship = relationships.get(name)
+        child_schema = nested_schema(field.annotation)
+        if relationship is None or child_schema is None or (relationship.mapper.class_, child_schema) in _path:
+            continue
+        if name in state.unloaded:
+            return False
+        value = state.dict.get(name)
+        children = value if relationship.uselist else [value]
+        path = _path + ((state.mapper.class_, schema),)
+        if not all(child is None or is_loaded(child, child_schema, path) for child in children):
+            return False
+    return True
+
+def get_rows_by_id(db: Session, model, ids, schema=None) -> dict:
+    """Load rows by primary key, serving them from the session's identity map when possible.
+
+    Rows the session already holds (unexpired, with whatever schema serializes loaded)
+    cost no SQL; the rest come from a single IN (...) query with the schema's loader
+    options. Returns {id: row}; missing ids are absent. See loader.Loader for batching.
+    """
+    mapper = inspect(model)
+    found = {}
+    missing = []
+    for obj_id in dict.fromkeys(ids):
+        obj = db.identity_map.get(mapper.identity_key_from_primary_key((obj_id,)))
+        if obj is not None and (is_loaded(obj, schema) if schema is not None else not inspect(obj).expired_attributes):
+            found[obj_id] = obj
+        else:
+            missing.append(obj_id)
+    if missing:
+        options = response_load_options(model, schema) if schema is not None else ()
+        statement = select(model).where(model.id.in_(missing)).options(*options).execution_options(populate_existing=True)
+        for obj in db.execute(statement).unique().scalars():
+            found[obj.id] = obj
+    return found
+
+def reload(db: Session, obj, options):
+    # Used after a commit instead of db.refresh(), which only reloads column attributes.
+    # The id comes from the identity key so an expired instance is not refreshed first.
+    model = type(obj)
+    obj_id = inspect(obj).identity[0]
+    return db.query(model).filter(model.id == obj_id).options(*options).populate_existing().first()
+
+# CRUD for Project
+def get_projects_by_owner(db: Session, owner_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, expand_tasks: bool = False):
+    query = db.query(Project).filter(Project.owner_id == owner_id)
+    if expand_tasks:
+        query = query.options(*PROJECT_RESPONSE_LOAD)
+    if after_id is not None:
+        query = query.filter(Project.id > after_id)
+    query = query.order_by(Project.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_owned_project(db: Session, project_id: int, owner_id: int):
+    return db.query(Project).filter(Project.id == project_id, Project.owner_id == owner_id).options(*PROJECT_RESPONSE_LOAD).first()
+
+def create_project(db: Session, project: ProjectCreate, owner_id: int):
+    db_project = Project(**project.dict(), owner_id=owner_id)
+    db.add(db_project)
+    db.commit()
+    return reload(db, db_project, PROJECT_RESPONSE_LOAD)
+
+def update_project(db: Session, db_project: Project, project: ProjectCreate):
+    for key, value in project.dict().items():
+        setattr(db_project, key, value)
+    db_project.version = Project.version + 1
+    db.commit()
+    return reload(db, db_project, PROJECT_RESPONSE_LOAD)
+
+def delete_project(db: Session, db_project: Project):
+    db.delete(db_project)
+    db.commit()
+    return db_project
+
 # CRUD for Milestone
 def get_milestone(db: Session, milestone_id: int):
-    return db.query(Milestone).filter(Milestone.id == milestone_id).first()
-
-def get_milestones_by_project(db: Session, project_id: int, skip: int = 0, limit: int = 10):
-    return db.query(Milestone).filter(Milestone.project_id == project_id).offset(skip).limit(limit).all()
+    return get_rows_by_id(db, Milestone, [milestone_id], MilestoneResponse).get(milestone_id)
+
+def get_milestone_etag_versions(db: Session, project_id: int, milestone_id: int):
+    # Every version the MilestoneResponse depends on, without loading it; None if not in the project.
+    return db.execute(
+        select(Milestone.version, Project.version)
+        .outerjoin(Project, Project.id == Milestone.project_id)
+        .where(Milestone.id == milestone_id, Milestone.project_id == project_id)
+    ).first()
+
+def paginate(query, model, skip: int, limit: int, after_id: Optional[int] = None):
+    # Keyset when after_id is given (id > after_id on the primary key), OFFSET otherwise.
+    if after_id is not None:
+        return query.filter(model.id > after_id).order_by(model.id).limit(limit).all()
+    return query.order_by(model.id).offset(skip).limit(limit).all()
+
+def get_milestones_by_project(db: Session, project_id: int, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = db.query(Milestone).filter(Milestone.project_id == project_id).options(*MILESTONE_RESPONSE_LOAD)
+    return paginate(query, Milestone, skip, limit, after_id)
 
 def create_milestone(db: Session, milestone: MilestoneCreate):
     db_milestone = Milestone(**milestone.dict())
     db.add(db_milestone)
     db.commit()
-    db.refresh(db_milestone)
-    return db_milestone
+    return reload(db, db_milestone, MILESTONE_RESPONSE_LOAD)
 
 def update_milestone(db: Session, db_milestone: Milestone, milestone_update: MilestoneUpdate):
     for key, value in milestone_update.dict(exclude_unset=True).items():
         setattr(db_milestone, key, value)
+    db_milestone.version = Milestone.version + 1
     db.commit()
-    db.refresh(db_milestone)
-    return db_milestone
+    return reload(db, db_milestone, MILESTONE_RESPONSE_LOAD)
 
 
 def delete_milestone(db: Session, milestone_id: int):
@@ -102,20 +309,31 @@ def delete_milestone(db: Session, milestone_id: int):
 
 # CRUD for TaskList
 def get_tasklist(db: Session, tasklist_id: int):
-    return db.query(TaskList).filter(TaskList.id == tasklist_id).first()
-
-def get_tasklists(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(TaskList).offset(skip).limit(limit).all()
-
-def get_tasklists_by_project(db: Session, project_id: int, skip: int = 0, limit: int = 10):
-    return db.query(TaskList).filter(TaskList.project_id == project_id).offset(skip).limit(limit).all()
+    return get_rows_by_id(db, TaskList, [tasklist_id], TaskListResponse).get(tasklist_id)
+
+def get_tasklist_etag_versions(db: Session, project_id: int, tasklist_id: int):
+    # TaskListResponse nests the milestone (with its project) and the task list's own project.
+    milestone_project = aliased(Project)
+    return db.execute(
+        select(TaskList.version, Milestone.version, milestone_project.version, Project.version)
+        .outerjoin(Milestone, Milestone.id == TaskList.milestone_id)
+        .outerjoin(milestone_project, milestone_project.id == Milestone.project_id)
+        .outerjoin(Project, Project.id == TaskList.project_id)
+        .where(TaskList.id == tasklist_id, TaskList.project_id == project_id)
+    ).first()
+
+def get_tasklists(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return paginate(db.query(TaskList).options(*TASKLIST_RESPONSE_LOAD), TaskList, skip, limit, after_id)
+
+def get_tasklists_by_project(db: Session, project_id: int, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = db.query(TaskList).filter(TaskList.project_id == project_id).options(*TASKLIST_RESPONSE_LOAD)
+    return paginate(query, TaskList, skip, limit, after_id)
 
 def create_tasklist(db: Session, tasklist: TaskListCreate):
     db_tasklist = TaskList(**tasklist.dict())
     db.add(db_tasklist)
     db.commit()
-    db.refresh(db_tasklist)
-    return db_tasklist
+    return reload(db, db_tasklist, TASKLIST_RESPONSE_LOAD)
 
 def delete_tasklist(db: Session, tasklist_id: int):
     db_tasklist = get_tasklist(db, tasklist_id)
@@ -130,10 +348,11 @@ def delete_tasklist(db: Session, tasklist_id: int):
 
 
 def get_project(db: Session, project_id: int):
-    return db.query(Project).filter(Project.id == project_id).first()
+    return get_rows_by_id(db, Project, [project_id]).get(project_id)
 
-def get_task(db: Session, project_id: int, task_id: int):
-    return db.query(Task).filter(Task.id == task_id, Task.project_id == project_id).options(joinedload(Task.subtasks)).first()
+def get_task(db: Session, project_id: int, task_id: int) -> Optional[Task]:
+    task = get_rows_by_id(db, Task, [task_id]).get(task_id)
+    return task if task is not None and task.project_id == project_id else None
 
 def create_task(db: Session, task_name: str, task_details: str, project_id: int, root_task_id: int = None):
     project = get_project(db, project_id)
@@ -141,41 +360,318 @@ def create_task(db: Session, task_name: str, task_details: str, project_id: int,
         raise HTTPException(status_code=404, detail="Project not found")
 
     if root_task_id is not None:
-        root_task = get_task(db, project_id, root_task_id)
-        if not root_task:
+        ancestors = get_task_ancestors(db, project_id, root_task_id)
+        if not ancestors:
             raise HTTPException(status_code=400, detail="Invalid root task for the project")
 
-        # Check if the root task is a valid parent (root_task should be null)
-        parent_task = root_task
-        while parent_task.root_task_id is not None:
-            parent_task = get_task(db, project_id, parent_task.root_task_id)
-            if not parent_task:
-                raise HTTPException(status_code=400, detail="Invalid task hierarchy")
+        # Check if the root task is a valid parent (its chain must end at a task whose root_task_id is null)
+        if not is_valid_root_task(db, project_id, root_task_id, ancestors):
+            raise HTTPException(status_code=400, detail="Invalid task hierarchy")
 
     new_task = Task(task_name=task_name, task_details=task_details, project_id=project_id, root_task_id=root_task_id)
     db.add(new_task)
+    bump_task_versions(db, project_id, [root_task_id])
+    db.flush()
+    add_task_closure(db, new_task)
+    task_forest.record_change(db, project_id, [("add", [(new_task.id, root_task_id, task_name)])])
+    search.index_tasks(db, [new_task.id])
     db.commit()
     db.refresh(new_task)
     return new_task
 
-def get_task(db: Session, project_id: int, task_id: int) -> Optional[Task]:
-    return db.query(Task).filter(Task.project_id == project_id, Task.id == task_id).first()
-
-def is_valid_root_task(db: Session, project_id: int, root_task_id: int) -> bool:
-    ancestor = get_task(db, project_id, root_task_id)
-    while ancestor is not None:
-        if ancestor.root_task_id is None:
-            return True
-        ancestor = get_task(db, project_id, ancestor.root_task_id)
-    return False
-
-def check_cyclic_dependency(db: Session, project_id: int, task_id: int, root_task_id: int) -> bool:
-    parent_task = get_task(db, project_id, root_task_id)
-    while parent_task is not None:
-        if parent_task.id == task_id:
-            return True
-        parent_task = get_task(db, project_id, parent_task.root_task_id)
-    return False
+# Upper bound on the recursive walk so a corrupted (cyclic) root_task_id chain cannot loop forever.
+MAX_TASK_DEPTH = 1000
+
+def get_task_ancestors(db: Session, project_id: int, task_id: int):
+    """Return (id, root_task_id) rows for task_id and all of its ancestors, nearest first.
+
+    The whole chain is resolved with a single WITH RECURSIVE query, which both
+    PostgreSQL and SQLite support, or with one indexed task_closure lookup when
+    TASK_CLOSURE_ENABLED is set. An empty list means task_id is not in the project.
+    """
+    if TASK_CLOSURE_ENABLED:
+        return db.execute(
+            select(Task.id, Task.root_task_id)
+            .join(TaskClosure, TaskClosure.ancestor_id == Task.id)
+            .where(TaskClosure.project_id == project_id, TaskClosure.descendant_id == task_id)
+            .order_by(TaskClosure.depth)
+        ).all()
+
+    ancestors = (
+        select(Task.id, Task.root_task_id, literal(0).label("depth"))
+        .where(Task.project_id == project_id, Task.id == task_id)
+        .cte("task_ancestors", recursive=True)
+    )
+    parent = aliased(Task)
+    ancestors = ancestors.union_all(
+        select(parent.id, parent.root_task_id, ancestors.c.depth + 1)
+        .where(
+            parent.project_id == project_id,
+            parent.id == ancestors.c.root_task_id,
+            ancestors.c.depth < MAX_TASK_DEPTH,
+        )
+    )
+    return db.execute(select(ancestors.c.id, ancestors.c.root_task_id).order_by(ancestors.c.depth)).all()
+
+def bump_task_versions(db: Session, project_id: int, task_ids):
+    """Increment the version of each task and all of its ancestors in one UPDATE.
+
+    A task's ETag covers its whole subtree, so any write below it must change the
+    version of every task on the path to the root.
+    """
+    seeds = [task_id for task_id in task_ids if task_id is not None]
+    if not seeds:
+        return
+    if TASK_CLOSURE_ENABLED:
+        chain = select(TaskClosure.ancestor_id).where(TaskClosure.descendant_id.in_(seeds))
+    else:
+        ancestors = (
+            select(Task.id, Task.root_task_id, literal(0).label("depth"))
+            .where(Task.project_id == project_id, Task.id.in_(seeds))
+            .cte("task_version_chain", recursive=True)
+        )
+        parent = aliased(Task)
+        ancestors = ancestors.union_all(
+            select(parent.id, parent.root_task_id, ancestors.c.depth + 1)
+            .where(parent.id == ancestors.c.root_task_id, ancestors.c.depth < MAX_TASK_DEPTH)
+        )
+        chain = select(ancestors.c.id)
+    db.execute(
+        update(Task)
+        .where(Task.id.in_(chain))
+        .values(version=Task.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def get_project_tasks_version(db: Session, project_id: int) -> Optional[int]:
+    return db.execute(select(Project.tasks_version).where(Project.id == project_id)).scalar()
+
+def load_task_forest(db: Session, project_id: int) -> Optional[task_forest.TaskForest]:
+    # Version and rows come from one statement, so the label matches the rows it covers.
+    rows = db.execute(
+        select(Project.tasks_version, Task.id, Task.root_task_id, Task.task_name)
+        .outerjoin(Task, Task.project_id == Project.id)
+        .where(Project.id == project_id)
+        .order_by(Task.id)
+    ).all()
+    if not rows:
+        return None
+    return task_forest.TaskForest.from_rows(rows[0].tasks_version, [row for row in rows if row.id is not None])
+
+def get_task_version(db: Session, project_id: int, task_id: int) -> Optional[int]:
+    return db.execute(select(Task.version).where(Task.project_id == project_id, Task.id == task_id)).scalar()
+
+def is_valid_root_task(db: Session, project_id: int, root_task_id: int, ancestors=None) -> bool:
+    if ancestors is None:
+        ancestors = get_task_ancestors(db, project_id, root_task_id)
+    return bool(ancestors) and ancestors[-1].root_task_id is None
+
+def check_cyclic_dependency(db: Session, project_id: int, task_id: int, root_task_id: int, ancestors=None) -> bool:
+    if ancestors is None:
+        ancestors = get_task_ancestors(db, project_id, root_task_id)
+    return any(ancestor.id == task_id for ancestor in ancestors)
+
+def get_task_depth(db: Session, project_id: int, task_id: int) -> Optional[int]:
+    if TASK_CLOSURE_ENABLED:
+        return db.execute(
+            select(func.max(TaskClosure.depth))
+            .where(TaskClosure.project_id == project_id, TaskClosure.descendant_id == task_id)
+        ).scalar()
+    ancestors = get_task_ancestors(db, project_id, task_id)
+    return len(ancestors) - 1 if ancestors else None
+
+def is_descendant_task(db: Session, project_id: int, task_id: int, ancestor_id: int) -> bool:
+    if TASK_CLOSURE_ENABLED:
+        return db.execute(
+            select(TaskClosure.depth)
+            .where(
+                TaskClosure.project_id == project_id,
+                TaskClosure.ancestor_id == ancestor_id,
+                TaskClosure.descendant_id == task_id,
+            )
+        ).first() is not None
+    return any(ancestor.id == ancestor_id for ancestor in get_task_ancestors(db, project_id, task_id))
+
+def add_task_closure(db: Session, task: Task):
+    # The task's own depth-0 row plus one row per ancestor of its parent, in a single INSERT ... SELECT.
+    rows = select(literal(task.id), literal(task.id), literal(0), literal(task.project_id))
+    if task.root_task_id is not None:
+        rows = rows.union_all(
+            select(TaskClosure.ancestor_id, literal(task.id), TaskClosure.depth + 1, TaskClosure.project_id)
+            .where(TaskClosure.descendant_id == task.root_task_id)
+        )
+    db.execute(insert(TaskClosure).from_select(["ancestor_id", "descendant_id", "depth", "project_id"], rows))
+
+def move_task_closure(db: Session, task_id: int, new_root_task_id: Optional[int]):
+    # Detach the subtree from its old ancestors, then attach it under every ancestor of the new parent.
+    subtree = select(TaskClosure.descendant_id).where(TaskClosure.ancestor_id == task_id)
+    old_ancestors = select(TaskClosure.ancestor_id).where(
+        TaskClosure.descendant_id == task_id, TaskClosure.ancestor_id != task_id
+    )
+    db.execute(
+        delete(TaskClosure)
+        .where(TaskClosure.descendant_id.in_(subtree), TaskClosure.ancestor_id.in_(old_ancestors))
+        .execution_options(synchronize_session=False)
+    )
+    if new_root_task_id is None:
+        return
+    above = aliased(TaskClosure)
+    below = aliased(TaskClosure)
+    db.execute(
+        insert(TaskClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth", "project_id"],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1, below.project_id)
+            .select_from(above)
+            .join(below, true())
+            .where(above.descendant_id == new_root_task_id, below.ancestor_id == task_id),
+        )
+    )
+
+# Rows per INSERT when rebuilding the closure table.
+CLOSURE_INSERT_CHUNK_SIZE = 5000
+
+def rebuild_task_closure(db: Session, project_ids: List[int]) -> int:
+    """Recompute task_closure for the given projects from root_task_id; returns rows written."""
+    db.execute(
+        delete(TaskClosure)
+        .where(TaskClosure.project_id.in_(project_ids))
+        .execution_options(synchronize_session=False)
+    )
+    parents = {}
+    projects = {}
+    for row in db.execute(select(Task.id, Task.root_task_id, Task.project_id).where(Task.project_id.in_(project_ids))):
+        parents[row.id] = row.root_task_id
+        projects[row.id] = row.project_id
+
+    chains = {}
+    rows = []
+    written = 0
+    for task_id in parents:
+        # Walk up until a task whose chain is already known, then fill the memo on the way back down.
+        path = []
+        node = task_id
+        while node in parents and node not in chains and len(path) <= MAX_TASK_DEPTH:
+            path.append(node)
+            node = parents[node]
+        chain = chains.get(node, [])
+        for node in reversed(path):
+            chain = [node] + chain
+            chains[node] = chain
+        for depth, ancestor_id in enumerate(chains[task_id]):
+            rows.append({"ancestor_id": ancestor_id, "descendant_id": task_id, "depth": depth, "project_id": projects[task_id]})
+        if len(rows) >= CLOSURE_INSERT_CHUNK_SIZE:
+            db.execute(insert(TaskClosure), rows)
+            written += len(rows)
+            rows = []
+    if rows:
+        db.execute(insert(TaskClosure), rows)
+        written += len(rows)
+    return written
+
+# Upper bound on one tasks:bulk request; larger plans are split by the client.
+MAX_BULK_TASKS = int(os.getenv("MAX_BULK_TASKS", "5000"))
+
+def order_bulk_tasks(items: List[BulkTaskItem]) -> List[BulkTaskItem]:
+    """Validate the temp_id forest in memory and return the items parents-first."""
+    by_temp_id = {}
+    for item in items:
+        if item.temp_id in by_temp_id:
+            raise HTTPException(status_code=400, detail=f"Duplicate temp_id {item.temp_id!r}")
+        if item.parent_temp_id is not None and item.root_task_id is not None:
+            raise HTTPException(status_code=400, detail=f"Task {item.temp_id!r} sets both parent_temp_id and root_task_id")
+        by_temp_id[item.temp_id] = item
+
+    children = {}
+    ordered = []
+    for item in items:
+        if item.parent_temp_id is None:
+            ordered.append(item)
+        elif item.parent_temp_id not in by_temp_id:
+            raise HTTPException(status_code=400, detail=f"Unknown parent_temp_id {item.parent_temp_id!r}")
+        else:
+            children.setdefault(item.parent_temp_id, []).append(item)
+    position = 0
+    while position < len(ordered):
+        ordered.extend(children.get(ordered[position].temp_id, []))
+        position += 1
+    # Anything not reachable from a top-level item sits on a parent_temp_id cycle.
+    if len(ordered) != len(items):
+        raise HTTPException(status_code=400, detail="Cyclic parent_temp_id references")
+    return ordered
+
+def bulk_create_tasks(db: Session, project_id: int, items: List[BulkTaskItem]) -> Dict[str, int]:
+    """Insert a forest of tasks in one transaction and return {temp_id: id}.
+
+    All rows go in with a single multi-row INSERT ... RETURNING (parents-first, so the
+    returned ids line up with the items), then one executemany UPDATE points the
+    in-batch children at their parents' new ids.
+    """
+    if len(items) > MAX_BULK_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_TASKS} tasks per request")
+    if not get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    ordered = order_bulk_tasks(items)
+    if not ordered:
+        return {}
+
+    # Existing parents only need to belong to the project: stored trees are acyclic and
+    # rooted because create_task and update_task enforce it.
+    existing_parents = {item.root_task_id for item in ordered if item.root_task_id is not None}
+    if existing_parents:
+        found = set(db.execute(
+            select(Task.id).where(Task.project_id == project_id, Task.id.in_(existing_parents))
+        ).scalars())
+        if found != existing_parents:
+            raise HTTPException(status_code=400, detail="Invalid root task for the project")
+
+    new_ids = db.execute(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True),
+        [
+            {"task_name": item.task_name, "task_details": item.task_details, "project_id": project_id, "root_task_id": item.root_task_id}
+            for item in ordered
+        ],
+    ).scalars().all()
+    ids = dict(zip((item.temp_id for item in ordered), new_ids))
+
+    parent_updates = [
+        {"id": ids[item.temp_id], "root_task_id": ids[item.parent_temp_id]}
+        for item in ordered if item.parent_temp_id is not None
+    ]
+    if parent_updates:
+        db.execute(update(Task), parent_updates)
+    bump_task_versions(db, project_id, existing_parents)
+
+    above = {}
+    if existing_parents:
+        for row in db.execute(
+            select(TaskClosure.descendant_id, TaskClosure.ancestor_id)
+            .where(TaskClosure.descendant_id.in_(existing_parents))
+            .order_by(TaskClosure.descendant_id, TaskClosure.depth)
+        ):
+            above.setdefault(row.descendant_id, []).append(row.ancestor_id)
+    chains = {}
+    rows = []
+    for item in ordered:
+        if item.parent_temp_id is not None:
+            chain = [ids[item.temp_id]] + chains[item.parent_temp_id]
+        else:
+            chain = [ids[item.temp_id]] + above.get(item.root_task_id, [])
+        chains[item.temp_id] = chain
+        rows.extend(
+            {"ancestor_id": ancestor_id, "descendant_id": chain[0], "depth": depth, "project_id": project_id}
+            for depth, ancestor_id in enumerate(chain)
+        )
+    for start in range(0, len(rows), CLOSURE_INSERT_CHUNK_SIZE):
+        db.execute(insert(TaskClosure), rows[start:start + CLOSURE_INSERT_CHUNK_SIZE])
+
+    added = [
+        (ids[item.temp_id], ids[item.parent_temp_id] if item.parent_temp_id is not None else item.root_task_id, item.task_name)
+        for item in ordered
+    ]
+    task_forest.record_change(db, project_id, [("add", added)])
+    search.index_tasks(db, new_ids)
+    db.commit()
+    return ids
 
 def update_task(db: Session, project_id: int, task_id: int, task_name: Optional[str] = None, task_details: Optional[str] = None, root_task_id: Optional[int] = None):
     task = get_task(db, project_id, task_id)
@@ -183,53 +679,208 @@ def update_task(db: Session, project_id: int, task_id: int, task_name: Optional[
         raise HTTPException(status_code=404, detail="Task not found")
 
     if root_task_id is not None:
-        root_task = get_task(db, project_id, root_task_id)
-        if not root_task:
+        # One ancestry query answers all three validations below.
+        ancestors = get_task_ancestors(db, project_id, root_task_id)
+        if not ancestors:
             raise HTTPException(status_code=400, detail="Invalid root task for the project")
 
-        if check_cyclic_dependency(db, project_id, task_id, root_task_id):
+        if check_cyclic_dependency(db, project_id, task_id, root_task_id, ancestors):
             raise HTTPException(status_code=400, detail="Invalid new root task value is'nt contain a parent task. so not allow to update existing parent")
 
-        if not is_valid_root_task(db, project_id, root_task_id):
+        if not is_valid_root_task(db, project_id, root_task_id, ancestors):
             raise HTTPException(status_code=400, detail="The new root task must have an ancestor with root_task_id as null")
 
-    if task.root_task_id is None and root_task_id is not None:
-        if not is_valid_root_task(db, project_id, root_task_id):
-            raise HTTPException(status_code=400, detail="The new root task must have an ancestor with root_task_id as null")
+    # Before the move, task_id's chain is the old ancestry; root_task_id's is the new one.
+    bump_task_versions(db, project_id, [task_id, root_task_id])
+    if task.root_task_id != root_task_id:
+        move_task_closure(db, task_id, root_task_id)
+
+    forest_ops = []
+    if task.root_task_id != root_task_id:
+        forest_ops.append(("move", task_id, root_task_id))
+    if task_name is not None and task_name != task.task_name:
+        forest_ops.append(("rename", task_id, task_name))
+    if forest_ops:
+        task_forest.record_change(db, project_id, forest_ops)
 
+    reindex = (task_name is not None and task_name != task.task_name) or (task_details is not None and task_details != task.task_details)
     if task_name is not None:
         task.task_name = task_name
     if task_details is not None:
         task.task_details = task_details
     task.root_task_id = root_task_id
+    if reindex:
+        db.flush()
+        search.index_tasks(db, [task_id])
 
     db.commit()
     db.refresh(task)
     return task
 
 
-def delete_task_and_subtasks(db: Session, task: Task):
-    for subtask in task.subtasks:
-        delete_task_and_subtasks(db, subtask)
-    db.delete(task)
+def task_subtree_selectable(project_id: int, task_id: int, max_depth: Optional[int] = None):
+    # (id, depth) for task_id and the tasks below it, down to max_depth levels (None = whole subtree).
+    if TASK_CLOSURE_ENABLED:
+        subtree = select(TaskClosure.descendant_id.label("id"), TaskClosure.depth).where(
+            TaskClosure.project_id == project_id, TaskClosure.ancestor_id == task_id
+        )
+        if max_depth is not None:
+            subtree = subtree.where(TaskClosure.depth <= max_depth)
+        return subtree.subquery("task_subtree")
+
+    limit = MAX_TASK_DEPTH if max_depth is None else min(max_depth, MAX_TASK_DEPTH)
+    descendants = (
+        select(Task.id, literal(0).label("depth"))
+        .where(Task.project_id == project_id, Task.id == task_id)
+        .cte("task_descendants", recursive=True)
+    )
+    child = aliased(Task)
+    return descendants.union_all(
+        select(child.id, descendants.c.depth + 1)
+        .where(
+            child.project_id == project_id,
+            child.root_task_id == descendants.c.id,
+            descendants.c.depth < limit,
+        )
+    )
+
+def get_task_descendants(db: Session, project_id: int, task_id: int):
+    """Return (id, depth) rows for task_id and every task below it, shallowest first."""
+    subtree = task_subtree_selectable(project_id, task_id)
+    return db.execute(select(subtree.c.id, subtree.c.depth).order_by(subtree.c.depth)).all()
+
+DEFAULT_TREE_MAX_NODES = 1000
+MAX_TREE_NODES = 10000
+# Levels below the root in any task tree response. pydantic-core refuses to validate or
+# encode nesting much past 255, so deeper subtrees are cut here rather than failing there.
+MAX_TREE_DEPTH = 200
+
+def get_task_tree(db: Session, project_id: int, task_id: int, depth: Optional[int] = None, max_nodes: int = DEFAULT_TREE_MAX_NODES):
+    """Load a task and its subtasks in one query and nest them in memory.
+
+    Rows come back breadth-first, so cutting the result at max_nodes still leaves a
+    connected tree. depth is clamped to MAX_TREE_DEPTH. Returns (tree, truncated), where
+    truncated means max_nodes or MAX_TREE_DEPTH left tasks out; tree is None when the
+    task does not exist.
+    """
+    capped = depth is None or depth > MAX_TREE_DEPTH
+    # One level past the cap shows whether the cap cut anything off.
+    subtree = task_subtree_selectable(project_id, task_id, MAX_TREE_DEPTH + 1 if capped else depth)
+    rows = db.execute(
+        select(Task.id, Task.task_name, Task.task_details, Task.project_id, Task.root_task_id, subtree.c.depth)
+        .join(subtree, subtree.c.id == Task.id)
+        .order_by(subtree.c.depth, Task.id)
+        .limit(max_nodes + 1)
+    ).all()
+    kept = [row for row in rows if row.depth <= MAX_TREE_DEPTH]
+    truncated = len(kept) > max_nodes or len(kept) < len(rows)
+    nodes = {}
+    for row in kept[:max_nodes]:
+        node = {"id": row.id, "task_name": row.task_name, "task_details": row.task_details,
+                "project_id": row.project_id, "root_task_id": row.root_task_id, "subtasks": []}
+        parent = nodes.get(row.root_task_id)
+        if parent is not None and row.id != task_id:
+            parent["subtasks"].append(node)
+        nodes[row.id] = node
+    return nodes.get(task_id), truncated
+
+# Keeps each DELETE ... WHERE id IN (...) well under driver bind-parameter limits.
+DELETE_CHUNK_SIZE = 1000
+
+def delete_task_subtree(db: Session, project_id: int, task_id: int) -> int:
+    descendants = get_task_descendants(db, project_id, task_id)
+    # Deepest first, so no chunk removes a parent before its subtasks (tasks.root_task_id FK).
+    task_ids = list(dict.fromkeys(row.id for row in reversed(descendants)))
+    if task_ids:
+        bump_task_versions(db, project_id, [task_id])
+    for start in range(0, len(task_ids), DELETE_CHUNK_SIZE):
+        chunk = task_ids[start:start + DELETE_CHUNK_SIZE]
+        db.execute(delete(TaskClosure).where(TaskClosure.descendant_id.in_(chunk)).execution_options(synchronize_session=False))
+        db.execute(delete(Task).where(Task.id.in_(chunk)).execution_options(synchronize_session=False))
+        search.unindex_tasks(db, chunk)
+    if task_ids:
+        task_forest.record_change(db, project_id, [("remove", task_ids)])
     db.commit()
+    return len(task_ids)
 
 def delete_task(db: Session, project_id: int, task_id: int):
-    task = get_task(db, project_id, task_id)
-    if not task:
+    deleted = delete_task_subtree(db, project_id, task_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Task not found")
-
-    delete_task_and_subtasks(db, task)
-    return {"detail": "Task and its subtasks deleted"}
+    return {"detail": "Task and its subtasks deleted", "deleted": deleted}
 
 
 def get_task_comments(db:Session,task_id:int):
     # type_name="task"
     return db.query(Comment).filter(Comment.type_id == task_id, Comment.type_name=="task").all()
 
+def get_task_comments_version(db: Session, task_id: int):
+    # Comments are append-only, so (count, newest id) identifies the list.
+    return tuple(db.execute(
+        select(func.count(), func.max(Comment.id)).where(Comment.type_id == task_id, Comment.type_name == "task")
+    ).one())
+
 def create_comment(db: Session, comment_create: str,type_id:int,type_name:str):
     comment_create = Comment(comment=comment_create,type_id=type_id,type_name=type_name)
     db.add(comment_create)
+    db.flush()
+    search.index_comments(db, [comment_create.id])
     db.commit()
     db.refresh(comment_create)
-    return comment_create
\ No newline at end of file
+    return comment_create
+
+MAX_COMMENT_BATCH_TASKS = 500
+MAX_BULK_COMMENTS = int(os.getenv("MAX_BULK_COMMENTS", "5000"))
+
+def parse_task_ids(value: str) -> List[int]:
+    """Parse a comma-separated task_ids query value, keeping the first occurrence order."""
+    try:
+        task_ids = list(dict.fromkeys(int(part) for part in value.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="task_ids must be comma-separated integers")
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="task_ids is required")
+    if len(task_ids) > MAX_COMMENT_BATCH_TASKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMMENT_BATCH_TASKS} task_ids per request")
+    return task_ids
+
+def project_task_comments(project_id: int, task_ids: List[int]):
+    # Comments only carry type_id, so the join on tasks scopes the batch to the project.
+    return (
+        select(Comment)
+        .join(Task, Task.id == Comment.type_id)
+        .where(Comment.type_name == "task", Comment.type_id.in_(task_ids), Task.project_id == project_id)
+    )
+
+def get_comments_for_tasks(db: Session, project_id: int, task_ids: List[int]) -> Dict[int, List[Comment]]:
+    grouped = {task_id: [] for task_id in task_ids}
+    for comment in db.execute(project_task_comments(project_id, task_ids).order_by(Comment.type_id, Comment.id)).scalars():
+        grouped[comment.type_id].append(comment)
+    return grouped
+
+def count_comments_for_tasks(db: Session, project_id: int, task_ids: List[int]) -> Dict[int, int]:
+    counts = {task_id: 0 for task_id in task_ids}
+    statement = project_task_comments(project_id, task_ids).with_only_columns(Comment.type_id, func.count()).group_by(Comment.type_id)
+    for type_id, count in db.execute(statement):
+        counts[type_id] = count
+    return counts
+
+def bulk_create_comments(db: Session, project_id: int, items: List[BulkCommentItem]) -> List[int]:
+    """Insert task comments with one multi-row INSERT ... RETURNING and a single commit."""
+    if len(items) > MAX_BULK_COMMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_COMMENTS} comments per request")
+    if not get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not items:
+        return []
+    task_ids = {item.task_id for item in items}
+    found = set(db.execute(select(Task.id).where(Task.project_id == project_id, Task.id.in_(task_ids))).scalars())
+    if found != task_ids:
+        raise HTTPException(status_code=400, detail=f"Tasks not in the project: {sorted(task_ids - found)}")
+    ids = db.execute(
+        insert(Comment).returning(Comment.id, sort_by_parameter_order=True),
+        [{"comment": item.comment, "type_id": item.task_id, "type_name": "task"} for item in items],
+    ).scalars().all()
+    search.index_comments(db, ids)
+    db.commit()
+    return ids
@@ -0,0 +1,35 @@
+"""Weak ETags and If-None-Match handling for the polled read endpoints.
+
+The tag is derived from row version counters (see models.py), so checking it costs at
+most one small query and a 304 skips loading and serializing the payload.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# Responses depend on the caller's token, and clients must revalidate before reuse.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: the W/ prefix is ignored on both sides.
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 when the client already holds etag; otherwise stamp it on response."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,119 @@
+"""bcrypt hashing and verification on a dedicated, size-limited process pool.
+
+bcrypt is deliberately CPU-heavy, so running it on the event loop or the shared
+threadpool lets a login storm starve every other endpoint. Work goes to
+HASH_POOL_SIZE worker processes instead, and once HASH_QUEUE_LIMIT operations are
+already queued or running in this worker, new ones are rejected with 429.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from metrics import Counter, Histogram
+
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _timed(fn, *args):
+    # Runs in the worker process; wall-clock stamps let the parent split queue wait from hash time.
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time()
+
+
+class HashPool:
+    def __init__(self, workers: int = HASH_POOL_SIZE, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.hash_latency = Histogram()
+        self.queue_wait = Histogram()
+        self.rejected = Counter()
+        self.restarts = Counter()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: workers must not inherit the parent's DB connections or threads.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _discard_executor(self, executor):
+        # Concurrent callers see the same broken pool; only the first one replaces it.
+        if self._executor is executor:
+            self._executor = None
+            self.restarts.inc()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, fn, *args):
+        # A worker that dies (OOM kill, segfault) breaks the whole executor; start a fresh
+        # pool and retry once, then give up with 503 rather than failing every later call.
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, _timed, fn, *args)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing is temporarily unavailable, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    async def run(self, fn, *args):
+        # in_flight is only touched from the event loop thread, so it needs no lock.
+        if self.in_flight >= self.queue_limit:
+            self.rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many password operations in progress, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        submitted = time.time()
+        try:
+            result, started, finished = await self._submit(fn, *args)
+        finally:
+            self.in_flight -= 1
+        self.queue_wait.observe(max(started - submitted, 0.0))
+        self.hash_latency.observe(finished - started)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected.value,
+            "restarts": self.restarts.value,
+            "hash_latency_seconds": self.hash_latency.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+
+hash_pool = HashPool()
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run(_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(_verify, plain_password, hashed_password)
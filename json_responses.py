@@ -0,0 +1,35 @@
+"""Fast JSON responses: orjson as the app default, pydantic-core for hot payloads.
+
+With a response_model FastAPI validates the return value, dumps it to Python objects
+and only then encodes them. model_response validates once and lets pydantic-core
+write the JSON bytes directly, skipping the intermediate objects. The task endpoints
+use it for their trees. Neither encoder handles arbitrary depth: orjson stops at 255
+nesting levels (roughly 127 task levels) and pydantic-core at about 255 task levels,
+so crud.get_task_tree caps trees at MAX_TREE_DEPTH before they get here.
+ORJSON_RESPONSES=false falls back to the stdlib encoder.
+"""
+import os
+from functools import lru_cache
+from typing import Mapping, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional: pinned in requirements.txt, but the app still runs without it
+    orjson = None
+
+ORJSON_RESPONSES = orjson is not None and os.getenv("ORJSON_RESPONSES", "true").lower() in ("1", "true", "yes")
+DefaultResponse = ORJSONResponse if ORJSON_RESPONSES else JSONResponse
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def model_response(schema, content, headers: Optional[Mapping[str, str]] = None, status_code: int = 200) -> Response:
+    """Validate content (dicts or ORM objects) against schema and encode it in one pass."""
+    adapter = type_adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
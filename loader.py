@@ -0,0 +1,51 @@
+"""Request-scoped, DataLoader-style loading by primary key.
+
+Lookups awaited in the same event-loop tick are queued and resolved together: one
+crud.get_rows_by_id call per (model, schema), i.e. one IN (...) query for whatever the
+session's identity map cannot already serve. Duplicate ids share one future. The Loader
+lives in session.info, so it is scoped to the request's session and dies with it.
+"""
+import asyncio
+import crud
+
+
+class Loader:
+    def __init__(self, db):
+        self.db = db
+        self.pending = {}
+        # A session runs one statement at a time; batches for different models take turns.
+        self.lock = asyncio.Lock()
+
+    def load(self, model, obj_id: int, schema=None) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        key = (model, schema)
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = {}
+            loop.call_soon(lambda: asyncio.ensure_future(self.dispatch(key)))
+        future = batch.get(obj_id)
+        if future is None:
+            future = batch[obj_id] = loop.create_future()
+        return future
+
+    async def dispatch(self, key):
+        batch = self.pending.pop(key)
+        model, schema = key
+        try:
+            async with self.lock:
+                rows = await crud.run_db(self.db, crud.get_rows_by_id, model, list(batch), schema)
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for obj_id, future in batch.items():
+            if not future.done():
+                future.set_result(rows.get(obj_id))
+
+
+def get_loader(db) -> Loader:
+    loader = db.info.get("loader")
+    if loader is None:
+        loader = db.info["loader"] = Loader(db)
+    return loader
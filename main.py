@@ -1,4 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import hmac
+import os
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -10,35 +12,50 @@ import models
 from database import *
 from typing import List 
 import crud
+import async_crud
 from crud import *
 import schemas
 from schemas import *
+from pool_metrics import pool_stats
+from hashing import hash_pool
+from pagination import resolve_after_id, set_next_cursor
+import project_listing
+import search
+import typeahead
+import profiler
+from etag import make_etag, not_modified
+from json_responses import DefaultResponse, model_response
 
-models.Base.metadata.create_all(bind=engine)
+# The schema is owned by migrations/ (python migrate.py upgrade runs before the workers
+# start), so importing the app never touches the database.
 
+app = FastAPI(default_response_class=DefaultResponse)
 
-app = FastAPI()
+if profiler.SQL_PROFILE_ENABLED:
+    profiler.install(engine)
+    if async_engine is not None:
+        profiler.install(async_engine.sync_engine)
+    app.add_middleware(profiler.SQLProfileMiddleware)
+
+@app.on_event("shutdown")
+def shutdown_hash_pool():
+    hash_pool.shutdown()
 
 # Project Endpoints
 
 @app.post("/register/", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user(db, user.email)
-    db_username = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: UserCreate, db: DBSession = Depends(get_db)):
+    db_user = await async_crud.get_user(db, user.email)
+    db_username = await async_crud.get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     if db_username:
         raise HTTPException(status_code=400, detail="Username already taken")
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(email=user.email, phonenumber=user.phonenumber, username=user.username, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    return await async_crud.create_user(db, user)
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(email: str, password: str, db: Session = Depends(get_db)):
-    user = authenticate_user(db, email, password)
+async def login_for_access_token(email: str, password: str, db: DBSession = Depends(get_db)):
+    user = await async_crud.authenticate_user(db, email, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,156 +69,334 @@ def login_for_access_token(email: str, password: str, db: Session = Depends(get_
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/projects/", response_model=ProjectResponse)
-def create_project(
-    project: ProjectCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+async def create_project(
+    project: ProjectCreate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)
 ):
-    db_project = models.Project(**project.dict(), owner_id=current_user.id)
-    db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
-    return db_project
+    return await async_crud.create_project(db, project, current_user.id)
 
-@app.get("/projects/", response_model=List[ProjectResponse])
-def read_projects(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Project).filter(models.Project.owner_id == current_user.id).all()
+@app.get("/projects/", response_model=List[ProjectSummary])
+async def read_projects(
+    limit: Optional[int] = Query(None, ge=1, le=project_listing.PROJECT_PAGE_MAX),
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    # Lean ProjectSummary rows by default; expand=tasks restores the nested ProjectResponse.
+    expanded = project_listing.parse_expand(expand)
+    schema = project_listing.project_schema(expanded)
+    include = project_listing.parse_fields(fields, schema)
+    after_id = resolve_after_id(after_id, cursor)
+    if limit is None:
+        return await project_listing.streaming_response(current_user.id, after_id, expanded, include)
+    projects = await async_crud.get_projects_by_owner(db, current_user.id, limit=limit, after_id=after_id, expand_tasks="tasks" in expanded)
+    response = Response(project_listing.encode_projects(projects, schema, include), media_type="application/json")
+    set_next_cursor(response, projects, limit)
+    return response
 
 @app.put("/projects/{project_id}", response_model=ProjectResponse)
-def update_project(
-    project_id: int, project: ProjectCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+async def update_project(
+    project_id: int, project: ProjectCreate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)
 ):
-    db_project = db.query(models.Project).filter(models.Project.id == project_id, models.Project.owner_id == current_user.id).first()
+    db_project = await async_crud.get_owned_project(db, project_id, current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    for key, value in project.dict().items():
-        setattr(db_project, key, value)
-    db.commit()
-    db.refresh(db_project)
-    return db_project
+    return await async_crud.update_project(db, db_project, project)
 
 @app.delete("/projects/{project_id}", response_model=ProjectResponse)
-def delete_project(project_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_project = db.query(models.Project).filter(models.Project.id == project_id, models.Project.owner_id == current_user.id).first()
+async def delete_project(project_id: int, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    db_project = await async_crud.get_owned_project(db, project_id, current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(db_project)
-    db.commit()
-    return db_project
+    return await async_crud.delete_project(db, db_project)
 
 
 # milestone Endpoints
 @app.post("/projects/{project_id}/milestones/", response_model=schemas.MilestoneResponse)
-def create_milestone_for_project(
+async def create_milestone_for_project(
     project_id: int,
     milestone: schemas.MilestoneCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     milestone.project_id = project_id
-    return crud.create_milestone(db, milestone)
+    return await async_crud.create_milestone(db, milestone)
 
 @app.get("/projects/{project_id}/milestones/", response_model=List[schemas.MilestoneResponse])
-def read_milestones_for_project(
-    project_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)
+async def read_milestones_for_project(
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: DBSession = Depends(get_db),
 ):
-    return crud.get_milestones_by_project(db, project_id, skip=skip, limit=limit)
+    milestones = await async_crud.get_milestones_by_project(db, project_id, skip=skip, limit=limit, after_id=resolve_after_id(after_id, cursor))
+    set_next_cursor(response, milestones, limit)
+    return milestones
 
 @app.get("/projects/{project_id}/milestones/{milestone_id}", response_model=schemas.MilestoneResponse)
-def read_milestone_for_project(
-    project_id: int, milestone_id: int, db: Session = Depends(get_db)
+async def read_milestone_for_project(
+    project_id: int, milestone_id: int, request: Request, response: Response, db: DBSession = Depends(get_db)
 ):
-    milestone = crud.get_milestone(db, milestone_id)
+    # Versions first, so a 304 never loads the milestone and its project.
+    versions = await async_crud.get_milestone_etag_versions(db, project_id, milestone_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Milestone not found")
+    cached = not_modified(request, response, make_etag("milestone", milestone_id, *versions))
+    if cached:
+        return cached
+    milestone = await async_crud.get_milestone(db, milestone_id)
     if not milestone or milestone.project_id != project_id:
         raise HTTPException(status_code=404, detail="Milestone not found")
     return milestone
 
 @app.put("/projects/{project_id}/milestones/{milestone_id}", response_model=schemas.MilestoneResponse)
-def update_milestone(
+async def update_milestone(
     project_id: int,
     milestone_id: int,
     milestone: schemas.MilestoneUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_milestone = crud.get_milestone(db, milestone_id)
+    db_milestone = await async_crud.get_milestone(db, milestone_id)
     if not db_milestone or db_milestone.project_id != project_id:
         raise HTTPException(status_code=404, detail="Milestone not found")
-    return crud.update_milestone(db, db_milestone, milestone)
+    return await async_crud.update_milestone(db, db_milestone, milestone)
 
 
 @app.delete("/projects/{project_id}/milestones/{milestone_id}", response_model=schemas.MilestoneResponse)
-def delete_milestone(
-    project_id: int, milestone_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+async def delete_milestone(
+    project_id: int, milestone_id: int, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)
 ):
-    milestone = crud.get_milestone(db, milestone_id)
+    milestone = await async_crud.get_milestone(db, milestone_id)
     if not milestone or milestone.project_id != project_id:
         raise HTTPException(status_code=404, detail="Milestone not found")
-    return crud.delete_milestone(db, milestone_id)
+    return await async_crud.delete_milestone(db, milestone_id)
 
 
 # TaskList Endpoints
 @app.post("/projects/{project_id}/tasklists/", response_model=schemas.TaskListResponse)
-def create_tasklist_for_project(
+async def create_tasklist_for_project(
     project_id: int,
     tasklist: schemas.TaskListCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     tasklist.project_id = project_id
-    return crud.create_tasklist(db, tasklist)
+    return await async_crud.create_tasklist(db, tasklist)
 
 @app.get("/projects/{project_id}/tasklists/", response_model=List[schemas.TaskListResponse])
-def read_tasklists_for_project(
-    project_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)
+async def read_tasklists_for_project(
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: DBSession = Depends(get_db),
 ):
-    return crud.get_tasklists_by_project(db, project_id, skip=skip, limit=limit)
+    tasklists = await async_crud.get_tasklists_by_project(db, project_id, skip=skip, limit=limit, after_id=resolve_after_id(after_id, cursor))
+    set_next_cursor(response, tasklists, limit)
+    return tasklists
 
 @app.get("/projects/{project_id}/tasklists/{tasklist_id}", response_model=schemas.TaskListResponse)
-def read_tasklist_for_project(
-    project_id: int, tasklist_id: int, db: Session = Depends(get_db)
+async def read_tasklist_for_project(
+    project_id: int, tasklist_id: int, request: Request, response: Response, db: DBSession = Depends(get_db)
 ):
-    tasklist = crud.get_tasklist(db, tasklist_id)
+    versions = await async_crud.get_tasklist_etag_versions(db, project_id, tasklist_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Task list not found")
+    cached = not_modified(request, response, make_etag("tasklist", tasklist_id, *versions))
+    if cached:
+        return cached
+    tasklist = await async_crud.get_tasklist(db, tasklist_id)
     if not tasklist or tasklist.project_id != project_id:
         raise HTTPException(status_code=404, detail="Task list not found")
     return tasklist
 
 @app.delete("/projects/{project_id}/tasklists/{tasklist_id}", response_model=schemas.TaskListResponse)
-def delete_tasklist(
-    project_id: int, tasklist_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+async def delete_tasklist(
+    project_id: int, tasklist_id: int, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)
 ):
-    tasklist = crud.get_tasklist(db, tasklist_id)
+    tasklist = await async_crud.get_tasklist(db, tasklist_id)
     if not tasklist or tasklist.project_id != project_id:
         raise HTTPException(status_code=404, detail="Task list not found")
-    return crud.delete_tasklist(db, tasklist_id)
+    return await async_crud.delete_tasklist(db, tasklist_id)
+
 
+# Task responses are built from get_task_tree so serialization never walks ORM subtasks, and are
+# encoded by model_response; response_model stays for validation docs and the OpenAPI schema.
+def tree_headers(truncated: bool) -> dict:
+    # Any response carrying a subtree cut at max_nodes or MAX_TREE_DEPTH says so.
+    return {"X-Tree-Truncated": "true"} if truncated else {}
 
 @app.post("/projects/{project_id}/tasks/", response_model=TaskResponse)
-def create_task_api(project_id: int, task: TaskCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return create_task(db, task.task_name, task.task_details, project_id, task.root_task_id)
+async def create_task_api(project_id: int, task: TaskCreate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    new_task = await async_crud.create_task(db, task.task_name, task.task_details, project_id, task.root_task_id)
+    tree, truncated = await async_crud.get_task_tree(db, project_id, new_task.id)
+    return model_response(TaskResponse, tree, headers=tree_headers(truncated))
+
+
+@app.post("/projects/{project_id}/tasks:bulk", response_model=BulkTaskResponse)
+async def bulk_create_tasks_api(project_id: int, payload: BulkTaskCreate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    ids = await async_crud.bulk_create_tasks(db, project_id, payload.tasks)
+    return {"ids": ids}
+
+
+@app.get("/projects/{project_id}/tasks:forest", response_model=TaskForestResponse)
+async def read_task_forest(project_id: int, request: Request, response: Response, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    version = await async_crud.get_project_tasks_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    cached = not_modified(request, response, make_etag("forest", project_id, version))
+    if cached:
+        return cached
+    forest = await async_crud.get_task_forest(db, project_id, version)
+    if forest is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if forest.version != version:
+        # Rebuilt after a newer write landed; label the response with what it contains.
+        response.headers["ETag"] = make_etag("forest", project_id, forest.version)
+    return forest.to_dict()
 
 
 @app.put("/projects/{project_id}/tasks/{task_id}", response_model=TaskResponse)
-def update_task_api(project_id: int, task_id: int, task: TaskUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return update_task(db, project_id, task_id, task.task_name, task.task_details, task.root_task_id)
+async def update_task_api(project_id: int, task_id: int, task: TaskUpdate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    await async_crud.update_task(db, project_id, task_id, task.task_name, task.task_details, task.root_task_id)
+    tree, truncated = await async_crud.get_task_tree(db, project_id, task_id)
+    return model_response(TaskResponse, tree, headers=tree_headers(truncated))
 
 
 @app.get("/projects/{project_id}/tasks/{task_id}", response_model=TaskResponse)
-def read_task(project_id: int, task_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    task = get_task(db, project_id, task_id)
+async def read_task(
+    project_id: int,
+    task_id: int,
+    request: Request,
+    response: Response,
+    depth: Optional[int] = Query(None, ge=0, le=crud.MAX_TREE_DEPTH),
+    max_nodes: int = Query(crud.DEFAULT_TREE_MAX_NODES, ge=1, le=crud.MAX_TREE_NODES),
+    db: DBSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    # The root's version changes on any write in its subtree, so it is checked before the tree is built.
+    version = await async_crud.get_task_version(db, project_id, task_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    cached = not_modified(request, response, make_etag("task", task_id, version, depth, max_nodes))
+    if cached:
+        return cached
+    task, truncated = await async_crud.get_task_tree(db, project_id, task_id, depth=depth, max_nodes=max_nodes)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    response.headers.update(tree_headers(truncated))
+    return model_response(TaskResponse, task, headers=response.headers)
 
 @app.delete("/projects/{project_id}/tasks/{task_id}")
-def delete_task_api(project_id: int, task_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return delete_task(db, project_id, task_id)
+async def delete_task_api(project_id: int, task_id: int, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return await async_crud.delete_task(db, project_id, task_id)
 
 @app.get("/projects/{project_id}/tasks/{task_id}/comments", response_model=List[CommentResponse])
-def get_comments(task_id:int, db: Session = Depends(get_db)):
-    get_comments=get_task_comments(db,task_id)
+async def get_comments(task_id:int, request: Request, response: Response, db: DBSession = Depends(get_db)):
+    cached = not_modified(request, response, make_etag("comments", task_id, *await async_crud.get_task_comments_version(db, task_id)))
+    if cached:
+        return cached
+    get_comments=await async_crud.get_task_comments(db,task_id)
     if get_comments is None:
         raise HTTPException(status_code=404,detail="no task")
     return get_comments
 
 @app.post("/projects/{project_id}/tasks/{task_id}/comments", response_model=CommentResponse)
-def create_task_comment(task_id:int,commentcreate:str, db: Session = Depends(get_db)):
-    return create_comment(db, commentcreate,type_id=task_id,type_name="task")
+async def create_task_comment(task_id:int,commentcreate:str, db: DBSession = Depends(get_db)):
+    return await async_crud.create_comment(db, commentcreate,type_id=task_id,type_name="task")
+
+
+# Batched comment reads for boards: one query for any number of tasks (up to MAX_COMMENT_BATCH_TASKS).
+@app.get("/projects/{project_id}/comments", response_model=TaskCommentsBatch)
+async def get_comments_for_tasks(project_id: int, task_ids: str = Query(...), db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    comments = await async_crud.get_comments_for_tasks(db, project_id, crud.parse_task_ids(task_ids))
+    return {"comments": comments}
+
+@app.get("/projects/{project_id}/comments/counts", response_model=TaskCommentCounts)
+async def count_comments_for_tasks(project_id: int, task_ids: str = Query(...), db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    counts = await async_crud.count_comments_for_tasks(db, project_id, crud.parse_task_ids(task_ids))
+    return {"counts": counts}
+
+@app.post("/projects/{project_id}/comments:bulk", response_model=BulkCommentResponse)
+async def bulk_create_comments_api(project_id: int, payload: BulkCommentCreate, db: DBSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    ids = await async_crud.bulk_create_comments(db, project_id, payload.comments)
+    return {"ids": ids}
+
+
+# Ranked full-text search over tasks and their comments in the caller's projects.
+@app.get("/search", response_model=List[SearchHit])
+async def search_api(
+    q: str = Query(..., min_length=1),
+    project_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(search.DEFAULT_SEARCH_LIMIT, ge=1, le=search.MAX_SEARCH_LIMIT),
+    db: DBSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    return await async_crud.full_text_search(db, current_user.id, q, project_id=project_id, skip=skip, limit=limit)
+
+
+# Name prefix lookups for search-as-you-type boxes; matching is case-insensitive.
+@app.get("/projects/{project_id}/tasks:typeahead", response_model=List[TypeaheadHit])
+async def task_typeahead(
+    project_id: int,
+    prefix: str = Query(..., min_length=1, max_length=typeahead.MAX_PREFIX_LENGTH),
+    limit: int = Query(typeahead.DEFAULT_TYPEAHEAD_LIMIT, ge=1, le=typeahead.MAX_TYPEAHEAD_LIMIT),
+    db: DBSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    prefix = typeahead.normalize(prefix)
+    if not prefix:
+        return []
+    hits = await async_crud.typeahead_tasks(db, project_id, prefix, limit)
+    if hits is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return hits
+
+
+@app.get("/projects:typeahead", response_model=List[TypeaheadHit])
+async def project_typeahead(
+    prefix: str = Query(..., min_length=1, max_length=typeahead.MAX_PREFIX_LENGTH),
+    limit: int = Query(typeahead.DEFAULT_TYPEAHEAD_LIMIT, ge=1, le=typeahead.MAX_TYPEAHEAD_LIMIT),
+    db: DBSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    prefix = typeahead.normalize(prefix)
+    if not prefix:
+        return []
+    return await async_crud.typeahead_projects(db, current_user.id, prefix, limit)
+
+# Internal operational endpoints, closed unless configured: callers send INTERNAL_STATS_TOKEN
+# as X-Internal-Token. INTERNAL_STATS_ALLOW_LOOPBACK additionally admits loopback clients
+# without a token; only turn it on when no reverse proxy on the same host forwards to the
+# app, since proxied requests arrive from loopback too.
+INTERNAL_STATS_TOKEN = os.getenv("INTERNAL_STATS_TOKEN")
+INTERNAL_STATS_ALLOW_LOOPBACK = os.getenv("INTERNAL_STATS_ALLOW_LOOPBACK", "false").lower() in ("1", "true", "yes")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def require_internal_access(request: Request):
+    token = request.headers.get("x-internal-token")
+    if INTERNAL_STATS_TOKEN and token is not None:
+        allowed = hmac.compare_digest(token.encode(), INTERNAL_STATS_TOKEN.encode())
+    else:
+        allowed = INTERNAL_STATS_ALLOW_LOOPBACK and request.client is not None and request.client.host in LOOPBACK_HOSTS
+    if not allowed:
+        # 404 rather than 401/403: the endpoint is not advertised to outside callers.
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/internal/stats", include_in_schema=False, dependencies=[Depends(require_internal_access)])
+async def internal_stats():
+    stats = {"pid": os.getpid(), "db_pool": pool_stats(engine), "password_hashing": hash_pool.stats()}
+    if async_engine is not None:
+        stats["async_db_pool"] = pool_stats(async_engine.sync_engine)
+    if profiler.SQL_PROFILE_ENABLED:
+        stats["slow_queries"] = profiler.slow_queries()
+    return stats
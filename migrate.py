@@ -0,0 +1,41 @@
+"""Schema migration CLI. Run it as a deploy step, before the app workers start.
+
+    python migrate.py upgrade [REVISION]     # default: head
+    python migrate.py downgrade REVISION     # or "base"
+    python migrate.py current
+    python migrate.py history
+    python migrate.py stamp REVISION         # adopt a database built by the old create_all (0001)
+"""
+import argparse
+
+import migrations
+from database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("upgrade").add_argument("revision", nargs="?", default="head")
+    commands.add_parser("downgrade").add_argument("revision")
+    commands.add_parser("current")
+    commands.add_parser("history")
+    commands.add_parser("stamp").add_argument("revision")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        migrations.upgrade(engine, args.revision)
+    elif args.command == "downgrade":
+        migrations.downgrade(engine, args.revision)
+    elif args.command == "current":
+        print(migrations.current_revision(engine) or "base")
+    elif args.command == "history":
+        current = migrations.current_revision(engine)
+        for module in migrations.load_revisions():
+            marker = " (current)" if module.revision == current else ""
+            print(f"{module.revision} <- {module.down_revision or 'base'}: {module.__doc__.strip().splitlines()[0]}{marker}")
+    elif args.command == "stamp":
+        migrations.stamp(engine, args.revision)
+
+
+if __name__ == "__main__":
+    main()
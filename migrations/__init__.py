@@ -0,0 +1,97 @@
+"""Versioned schema migrations, Alembic-style.
+
+Each module in migrations/versions defines `revision`, `down_revision`, `upgrade(conn)`
+and `downgrade(conn)`. A module may set `transactional = False` for statements that
+PostgreSQL refuses to run inside a transaction (CREATE INDEX CONCURRENTLY); every other
+revision runs in its own transaction together with the version bump. The applied
+revision is recorded in the single-row schema_version table.
+"""
+import importlib.util
+from pathlib import Path
+from typing import List, Optional
+from sqlalchemy import Column, MetaData, String, Table, delete, insert, select
+
+VERSIONS_DIR = Path(__file__).parent / "versions"
+
+version_table = Table("schema_version", MetaData(), Column("version_num", String(32), primary_key=True))
+
+
+def load_revisions() -> List:
+    """Return the revision modules ordered from base to head."""
+    modules = {}
+    for path in sorted(VERSIONS_DIR.glob("[0-9]*.py")):
+        spec = importlib.util.spec_from_file_location(f"migrations.versions.{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        modules[module.revision] = module
+    children = {module.down_revision: module for module in modules.values()}
+    if len(children) != len(modules):
+        raise RuntimeError("Migration history has branches; every revision needs a unique down_revision")
+    chain = []
+    module = children.get(None)
+    while module is not None:
+        chain.append(module)
+        module = children.get(module.revision)
+    if len(chain) != len(modules):
+        raise RuntimeError("Migration history is not a single chain from base to head")
+    return chain
+
+
+def current_revision(engine) -> Optional[str]:
+    with engine.connect() as conn:
+        version_table.create(conn, checkfirst=True)
+        conn.commit()
+        return conn.execute(select(version_table.c.version_num)).scalar()
+
+
+def _index(chain, revision: Optional[str]) -> int:
+    # -1 is "base" (nothing applied).
+    if revision in (None, "base"):
+        return -1
+    if revision == "head":
+        return len(chain) - 1
+    for position, module in enumerate(chain):
+        if module.revision == revision:
+            return position
+    raise ValueError(f"Unknown revision {revision!r}")
+
+
+def _set_version(conn, revision: Optional[str]):
+    conn.execute(delete(version_table))
+    if revision is not None:
+        conn.execute(insert(version_table).values(version_num=revision))
+
+
+def _run(engine, module, step: str, new_revision: Optional[str]):
+    if getattr(module, "transactional", True):
+        with engine.begin() as conn:
+            getattr(module, step)(conn)
+            _set_version(conn, new_revision)
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        getattr(module, step)(conn)
+        _set_version(conn, new_revision)
+
+
+def upgrade(engine, target: str = "head", log=print):
+    chain = load_revisions()
+    start = _index(chain, current_revision(engine))
+    for module in chain[start + 1:_index(chain, target) + 1]:
+        log(f"upgrade {module.down_revision or 'base'} -> {module.revision}: {module.__doc__.strip().splitlines()[0]}")
+        _run(engine, module, "upgrade", module.revision)
+
+
+def downgrade(engine, target: str, log=print):
+    chain = load_revisions()
+    start = _index(chain, current_revision(engine))
+    for module in reversed(chain[_index(chain, target) + 1:start + 1]):
+        log(f"downgrade {module.revision} -> {module.down_revision or 'base'}")
+        _run(engine, module, "downgrade", module.down_revision)
+
+
+def stamp(engine, target: str):
+    chain = load_revisions()
+    position = _index(chain, target)
+    with engine.begin() as conn:
+        version_table.create(conn, checkfirst=True)
+        _set_version(conn, chain[position].revision if position >= 0 else None)
@@ -0,0 +1,61 @@
+"""Initial schema: the tables main.py used to create with metadata.create_all."""
+from sqlalchemy import Column, Date, ForeignKey, Integer, MetaData, String, Table, Text
+
+revision = "0001"
+down_revision = None
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("phonenumber", String, unique=True, index=True),
+    Column("hashed_password", String),
+)
+Table(
+    "projects", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("projectname", String, index=True),
+    Column("description", String),
+    Column("due_date", Date),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+)
+Table(
+    "milestones", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("milestone_name", String, index=True),
+    Column("start_date", Date),
+    Column("end_date", Date),
+    Column("project_id", Integer, ForeignKey("projects.id")),
+)
+Table(
+    "task_lists", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("task_name", String, index=True),
+    Column("milestone_id", Integer, ForeignKey("milestones.id")),
+    Column("project_id", Integer, ForeignKey("projects.id")),
+)
+Table(
+    "tasks", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("task_name", String, index=True),
+    Column("task_details", Text),
+    Column("project_id", Integer, ForeignKey("projects.id")),
+    Column("root_task_id", Integer, ForeignKey("tasks.id"), nullable=True),
+)
+Table(
+    "comments", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("type_name", String, index=True),
+    Column("type_id", Integer),
+    Column("comment", String, index=True),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn)
+
+
+def downgrade(conn):
+    metadata.drop_all(conn)
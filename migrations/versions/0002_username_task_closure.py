@@ -0,0 +1,33 @@
+"""Add users.username and the task_closure table."""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table, inspect, text
+
+revision = "0002"
+down_revision = "0001"
+
+metadata = MetaData()
+
+# Referenced tables only need their key columns for the foreign keys to resolve.
+Table("tasks", metadata, Column("id", Integer, primary_key=True))
+Table("projects", metadata, Column("id", Integer, primary_key=True))
+task_closure = Table(
+    "task_closure", metadata,
+    Column("ancestor_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("depth", Integer, nullable=False),
+    Column("project_id", Integer, ForeignKey("projects.id"), index=True),
+)
+
+
+def upgrade(conn):
+    # Databases bootstrapped by the old create_all may already have task_closure but never
+    # got the username column, so both steps check first.
+    if "username" not in {column["name"] for column in inspect(conn).get_columns("users")}:
+        conn.execute(text("ALTER TABLE users ADD COLUMN username VARCHAR"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users (username)"))
+    task_closure.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    task_closure.drop(conn, checkfirst=True)
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_username"))
+    conn.execute(text("ALTER TABLE users DROP COLUMN username"))
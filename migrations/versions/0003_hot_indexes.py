@@ -0,0 +1,46 @@
+"""Composite indexes for the hot crud.py filters; drop write-only indexes."""
+from sqlalchemy import text
+
+revision = "0003"
+down_revision = "0002"
+
+# CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+transactional = False
+
+CREATED = [
+    ("ix_comments_type_id_type_name", "comments (type_id, type_name)"),
+    ("ix_tasks_project_id_id", "tasks (project_id, id)"),
+    ("ix_tasks_root_task_id", "tasks (root_task_id)"),
+    ("ix_milestones_project_id_id", "milestones (project_id, id)"),
+    ("ix_task_lists_project_id_id", "task_lists (project_id, id)"),
+    ("ix_projects_owner_id_id", "projects (owner_id, id)"),
+]
+# Free-text comment bodies, type_name alone (covered above) and duplicates of primary keys.
+DROPPED = [
+    ("ix_comments_comment", "comments (comment)"),
+    ("ix_comments_type_name", "comments (type_name)"),
+    ("ix_comments_id", "comments (id)"),
+    ("ix_users_id", "users (id)"),
+    ("ix_projects_id", "projects (id)"),
+    ("ix_milestones_id", "milestones (id)"),
+    ("ix_task_lists_id", "task_lists (id)"),
+    ("ix_tasks_id", "tasks (id)"),
+]
+
+
+def _concurrently(conn):
+    return "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+
+
+def upgrade(conn):
+    for name, target in CREATED:
+        conn.execute(text(f"CREATE INDEX {_concurrently(conn)}IF NOT EXISTS {name} ON {target}"))
+    for name, _ in DROPPED:
+        conn.execute(text(f"DROP INDEX {_concurrently(conn)}IF EXISTS {name}"))
+
+
+def downgrade(conn):
+    for name, target in DROPPED:
+        conn.execute(text(f"CREATE INDEX {_concurrently(conn)}IF NOT EXISTS {name} ON {target}"))
+    for name, _ in CREATED:
+        conn.execute(text(f"DROP INDEX {_concurrently(conn)}IF EXISTS {name}"))
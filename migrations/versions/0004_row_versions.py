@@ -0,0 +1,17 @@
+"""Add version counters to projects, milestones, task_lists and tasks for ETags."""
+from sqlalchemy import text
+
+revision = "0004"
+down_revision = "0003"
+
+TABLES = ["projects", "milestones", "task_lists", "tasks"]
+
+
+def upgrade(conn):
+    for table in TABLES:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def downgrade(conn):
+    for table in TABLES:
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN version"))
@@ -0,0 +1,13 @@
+"""Add projects.tasks_version, the label of cached task forests."""
+from sqlalchemy import text
+
+revision = "0005"
+down_revision = "0004"
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE projects ADD COLUMN tasks_version INTEGER NOT NULL DEFAULT 0"))
+
+
+def downgrade(conn):
+    conn.execute(text("ALTER TABLE projects DROP COLUMN tasks_version"))
@@ -0,0 +1,55 @@
+"""Full-text search indexes for tasks and comments (tsvector + GIN, or SQLite FTS5)."""
+from sqlalchemy import text
+# The backfill must use the configuration search.py queries with.
+from search import SEARCH_TEXT_CONFIG
+
+revision = "0006"
+down_revision = "0005"
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL; the backfill
+# commits in batches so it never holds row locks on a whole table.
+transactional = False
+
+BACKFILL_BATCH = 10000
+
+# (table, tsvector source expression, index)
+SEARCHED = [
+    ("tasks", "coalesce(task_name, '') || ' ' || coalesce(task_details, '')", "ix_tasks_search_vector"),
+    ("comments", "coalesce(comment, '')", "ix_comments_search_vector"),
+]
+
+
+def backfill(conn, table: str, source: str):
+    # Rows written meanwhile by code that predates search.index_tasks are still NULL and get picked up.
+    last_id = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+    for start in range(0, last_id + 1, BACKFILL_BATCH):
+        conn.execute(text(
+            f"UPDATE {table} SET search_vector = to_tsvector(CAST(:config AS regconfig), {source}) "
+            "WHERE id >= :start AND id < :stop AND search_vector IS NULL"
+        ), {"config": SEARCH_TEXT_CONFIG, "start": start, "stop": start + BACKFILL_BATCH})
+
+
+def upgrade(conn):
+    if conn.dialect.name == "postgresql":
+        for table, source, index in SEARCHED:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+            backfill(conn, table, source)
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} USING GIN (search_vector)"))
+        return
+    # SQLite: standalone FTS5 tables whose rowid is the task/comment id.
+    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(task_name, task_details)"))
+    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS comment_search USING fts5(comment)"))
+    conn.execute(text("DELETE FROM task_search"))
+    conn.execute(text("DELETE FROM comment_search"))
+    conn.execute(text("INSERT INTO task_search (rowid, task_name, task_details) SELECT id, task_name, task_details FROM tasks"))
+    conn.execute(text("INSERT INTO comment_search (rowid, comment) SELECT id, comment FROM comments"))
+
+
+def downgrade(conn):
+    if conn.dialect.name == "postgresql":
+        for table, _, index in SEARCHED:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector"))
+        return
+    conn.execute(text("DROP TABLE IF EXISTS comment_search"))
+    conn.execute(text("DROP TABLE IF EXISTS task_search"))
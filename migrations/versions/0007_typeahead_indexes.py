@@ -0,0 +1,40 @@
+"""Prefix (typeahead) indexes on lower(name); drop the unused plain name indexes."""
+from sqlalchemy import text
+
+revision = "0007"
+down_revision = "0006"
+
+# CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+transactional = False
+
+# (name, table, leading column, name column)
+CREATED = [
+    ("ix_tasks_project_id_lower_task_name", "tasks", "project_id", "task_name"),
+    ("ix_projects_owner_id_lower_projectname", "projects", "owner_id", "projectname"),
+]
+# Never used by a crud.py query: equality on these names is not a lookup path.
+DROPPED = [
+    ("ix_tasks_task_name", "tasks (task_name)"),
+    ("ix_task_lists_task_name", "task_lists (task_name)"),
+    ("ix_milestones_milestone_name", "milestones (milestone_name)"),
+    ("ix_projects_projectname", "projects (projectname)"),
+]
+
+
+def upgrade(conn):
+    postgres = conn.dialect.name == "postgresql"
+    concurrently = "CONCURRENTLY " if postgres else ""
+    # text_pattern_ops lets LIKE 'prefix%' use the index whatever the database collation.
+    ops = " text_pattern_ops" if postgres else ""
+    for name, table, leading, column in CREATED:
+        conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({leading}, lower({column}){ops})"))
+    for name, _ in DROPPED:
+        conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+
+
+def downgrade(conn):
+    concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+    for name, target in DROPPED:
+        conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {target}"))
+    for name, *_ in CREATED:
+        conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -6,8 +6,9 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True)
+    username = Column(String, unique=True, index=True)
     phonenumber = Column(String, unique=True, index=True)
     hashed_password = Column(String)
 
@@ -15,11 +16,25 @@ class User(Base):
 
 class Project(Base):
     __tablename__ = "projects"
-    id = Column(Integer, primary_key=True, index=True)
-    projectname = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    projectname = Column(String)
     description = Column(String)
     due_date = Column(Date)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Bumped by crud.py on every write that changes the row's response; feeds the ETags.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Bumped by every task write in the project; labels cached task forests (task_forest.py).
+    tasks_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # get_projects_by_owner: owner_id = ? ORDER BY id (keyset pages); the lower() index serves
+    # name typeahead (text_pattern_ops so LIKE 'prefix%' can use it under any collation).
+    __table_args__ = (
+        Index("ix_projects_owner_id_id", "owner_id", "id"),
+        Index(
+            "ix_projects_owner_id_lower_projectname", "owner_id", func.lower(projectname).label("lower_projectname"),
+            postgresql_ops={"lower_projectname": "text_pattern_ops"},
+        ),
+    )
 
     owner = relationship("User", back_populates="projects")
     milestones = relationship("Milestone", back_populates="project")
@@ -30,11 +45,14 @@ class Project(Base):
 class Milestone(Base):
     __tablename__ = 'milestones'
 
-    id = Column(Integer, primary_key=True, index=True)
-    milestone_name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    milestone_name = Column(String)
     start_date = Column(Date)
     end_date = Column(Date)
     project_id = Column(Integer, ForeignKey('projects.id'))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (Index("ix_milestones_project_id_id", "project_id", "id"),)
 
     project = relationship("Project", back_populates="milestones")
     tasks = relationship("TaskList", back_populates="milestone")
@@ -42,10 +60,13 @@ class Milestone(Base):
 class TaskList(Base):
     __tablename__ = 'task_lists'
 
-    id = Column(Integer, primary_key=True, index=True)
-    task_name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    task_name = Column(String)
     milestone_id = Column(Integer, ForeignKey('milestones.id'))
     project_id = Column(Integer, ForeignKey('projects.id'))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (Index("ix_task_lists_project_id_id", "project_id", "id"),)
 
     milestone = relationship("Milestone", back_populates="tasks")
     project = relationship("Project", back_populates="tasks")
@@ -54,11 +75,22 @@ class TaskList(Base):
 class Task(Base):
     __tablename__ = 'tasks'
 
-    id = Column(Integer, primary_key=True, index=True)
-    task_name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    task_name = Column(String)
     task_details = Column(Text)
     project_id = Column(Integer, ForeignKey('projects.id'))
-    root_task_id = Column(Integer, ForeignKey('tasks.id'), nullable=True)
+    root_task_id = Column(Integer, ForeignKey('tasks.id'), nullable=True, index=True)
+    # Covers the whole subtree: writes bump the task and every ancestor (crud.bump_task_versions).
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Project-scoped lookups and listings; root_task_id above serves the subtree walks.
+    __table_args__ = (
+        Index("ix_tasks_project_id_id", "project_id", "id"),
+        Index(
+            "ix_tasks_project_id_lower_task_name", "project_id", func.lower(task_name).label("lower_task_name"),
+            postgresql_ops={"lower_task_name": "text_pattern_ops"},
+        ),
+    )
 
     project = relationship("Project", back_populates="subtask")
     root_task = relationship("Task", remote_side=[id], back_populates="subtasks", uselist=False)
@@ -68,8 +100,21 @@ class Task(Base):
 class Comment(Base):
     __tablename__ = 'comments'
     
-    id = Column(Integer,primary_key=True, index=True)
-    type_name = Column(String,index=True)
+    id = Column(Integer,primary_key=True)
+    type_name = Column(String)
     type_id = Column(Integer)
-    comment = Column(String, index=True)
+    comment = Column(String)
+
+    # get_task_comments: type_id = ? AND type_name = 'task'
+    __table_args__ = (Index("ix_comments_type_id_type_name", "type_id", "type_name"),)
     
+
+
+class TaskClosure(Base):
+    __tablename__ = 'task_closure'
+
+    # One row per (ancestor, descendant) pair, including each task paired with itself at depth 0.
+    ancestor_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+    project_id = Column(Integer, ForeignKey('projects.id'), index=True)
@@ -0,0 +1,34 @@
+"""Opaque keyset cursors for the list endpoints.
+
+A cursor wraps the id of the last row of a page; the next page is `id > after_id`
+ordered by id, which walks the primary-key index instead of counting past OFFSET rows.
+"""
+import base64
+import binascii
+import json
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(after_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after_id": after_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data["after_id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def resolve_after_id(after_id, cursor):
+    # An opaque cursor wins over a raw after_id when a client sends both.
+    return decode_cursor(cursor) if cursor is not None else after_id
+
+
+def set_next_cursor(response: Response, items, limit: int):
+    # A short page means there is nothing after it.
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
@@ -0,0 +1,60 @@
+"""Connection pool instrumentation for database.engine and database.async_engine."""
+import time
+from sqlalchemy import exc
+from metrics import Counter, Histogram
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.connect_latency = Histogram()
+        self.checkout_timeouts = Counter()
+
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """Subclass a QueuePool-style pool class so every checkout and new connection is timed.
+
+    The metrics live on the class, so they survive Pool.recreate() on engine.dispose().
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return base._do_get(self)
+        except exc.TimeoutError:
+            self.metrics.checkout_timeouts.inc()
+            raise
+        finally:
+            self.metrics.checkout_wait.observe(time.perf_counter() - start)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return base._create_connection(self)
+        finally:
+            self.metrics.connect_latency.observe(time.perf_counter() - start)
+
+    return type(f"Instrumented{base.__name__}", (base,), {
+        "metrics": metrics,
+        "_do_get": _do_get,
+        "_create_connection": _create_connection,
+    })
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if hasattr(pool, "checkedout"):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(
+            checkout_timeouts=metrics.checkout_timeouts.value,
+            checkout_wait_seconds=metrics.checkout_wait.snapshot(),
+            connect_latency_seconds=metrics.connect_latency.snapshot(),
+        )
+    return stats
@@ -0,0 +1,223 @@
+"""Per-request SQL profile: which route and crud function issued each statement, and how long it took.
+
+With SQL_PROFILE_ENABLED, engine event hooks time every statement and charge it to the
+request's RequestProfile (a contextvar set by SQLProfileMiddleware) under the crud
+function that crud.run_db is running, or, for statements issued elsewhere, the nearest
+app-module frame on the stack. Each response then carries a Server-Timing header:
+
+    Server-Timing: db;dur=4.210;desc="6 queries", get_task_tree;dur=3.100;desc="4 queries", ...
+
+and one "sql_profile" log line per request. Statements slower than SLOW_QUERY_MS are
+logged and kept for /internal/stats as statement text only: bound parameters carry
+emails and password hashes, so they are captured only with SLOW_QUERY_LOG_PARAMETERS,
+a debugging switch that is off by default. With SLOW_QUERY_EXPLAIN on PostgreSQL a
+SLOW_QUERY_EXPLAIN_SAMPLE share of slow read-only SELECTs is re-run under
+EXPLAIN (ANALYZE, BUFFERS) and the plan attached; writes are never re-run.
+
+Streaming responses send their headers before the body's queries run, so their
+Server-Timing only covers the statements issued up to the first chunk.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from sqlalchemy import event
+
+SQL_PROFILE_ENABLED = os.getenv("SQL_PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+SLOW_QUERY_LOG_PARAMETERS = os.getenv("SLOW_QUERY_LOG_PARAMETERS", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_LOG_SIZE = 50
+# Server-Timing entries per response besides the db total; the slowest functions win.
+SERVER_TIMING_FUNCTIONS = 5
+MAX_LOGGED_PARAMETERS = 1000
+# Modules whose frames name the caller of statements issued outside run_db.
+APP_MODULES = frozenset({"crud", "async_crud", "search", "typeahead", "task_forest", "project_listing", "loader"})
+
+logger = logging.getLogger("sql_profile")
+
+current_profile: ContextVar = ContextVar("sql_profile", default=None)
+current_function: ContextVar = ContextVar("sql_profile_function", default=None)
+_explaining: ContextVar = ContextVar("sql_profile_explaining", default=False)
+
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_route_paths = {}
+
+
+def route_label(scope) -> str:
+    """"GET /projects/{project_id}/tasks/{task_id}" once routed, the raw path before that."""
+    endpoint = scope.get("endpoint")
+    path = _route_paths.get(endpoint)
+    if path is None and endpoint is not None and "app" in scope:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                path = _route_paths[endpoint] = route.path
+                break
+    return f"{scope.get('method', '')} {path or scope.get('path', '')}"
+
+
+class RequestProfile:
+    """Statement count and DB time for one request, in total and per crud function."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.total = 0.0
+        self.functions = {}
+        self._lock = threading.Lock()  # sync sessions run statements in threadpool workers
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+    def record(self, function: str, elapsed: float):
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            count, total = self.functions.get(function, (0, 0.0))
+            self.functions[function] = (count + 1, total + elapsed)
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.total * 1000:.3f};desc="{self.count} queries"']
+        slowest = sorted(self.functions.items(), key=lambda item: item[1][1], reverse=True)[:SERVER_TIMING_FUNCTIONS]
+        for function, (count, total) in slowest:
+            entries.append(f'{function};dur={total * 1000:.3f};desc="{count} queries"')
+        return ", ".join(entries)
+
+
+def attributed(fn):
+    """Wrap a crud function so the statements it issues are charged to it."""
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = current_function.set(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            current_function.reset(token)
+    return wrapper
+
+
+def _calling_function() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__") in APP_MODULES:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _explaining.get():
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profile_started", None)
+    if started is None or _explaining.get():
+        return
+    elapsed = time.perf_counter() - started
+    profile = current_profile.get()
+    function = current_function.get() or _calling_function()
+    if profile is not None:
+        profile.record(function, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        _log_slow_query(conn, statement, parameters, executemany, elapsed, profile, function)
+
+
+def _log_slow_query(conn, statement, parameters, executemany, elapsed, profile, function):
+    entry = {
+        "route": profile.route if profile is not None else None,
+        "function": function,
+        "ms": round(elapsed * 1000, 3),
+        "statement": statement,
+    }
+    if SLOW_QUERY_LOG_PARAMETERS:
+        entry["parameters"] = repr(parameters)[:MAX_LOGGED_PARAMETERS]
+    if (
+        SLOW_QUERY_EXPLAIN and not executemany and conn.dialect.name == "postgresql"
+        and is_read_only(statement) and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE
+    ):
+        entry["plan"] = _explain(conn, statement, parameters)
+    _slow_queries.append(entry)
+    logger.warning(
+        "slow query %.1fms route=%s function=%s: %s%s%s",
+        entry["ms"], entry["route"], function, statement,
+        " params=" + entry["parameters"] if "parameters" in entry else "",
+        "\n" + entry["plan"] if "plan" in entry else "",
+    )
+
+
+WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|FOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE))\b", re.IGNORECASE)
+
+def is_read_only(statement: str) -> bool:
+    # EXPLAIN ANALYZE executes the statement: only SELECTs (including WITH ... SELECT, e.g. the
+    # recursive subtree walks) that write nothing, lock nothing and create nothing qualify.
+    words = statement.split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH") and not WRITE_KEYWORDS.search(statement)
+
+
+def _explain(conn, statement, parameters) -> str:
+    # Re-runs the statement; the savepoint keeps a failed EXPLAIN from aborting the transaction.
+    token = _explaining.set(True)
+    try:
+        conn.exec_driver_sql("SAVEPOINT sql_profile_explain")
+        try:
+            rows = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters).all()
+        except Exception as exc:
+            conn.exec_driver_sql("ROLLBACK TO SAVEPOINT sql_profile_explain")
+            return f"EXPLAIN failed: {exc}"
+        conn.exec_driver_sql("RELEASE SAVEPOINT sql_profile_explain")
+        return "\n".join(row[0] for row in rows)
+    except Exception as exc:
+        return f"EXPLAIN failed: {exc}"
+    finally:
+        _explaining.reset(token)
+
+
+def install(engine):
+    """Attach the timing hooks to a sync Engine (for an AsyncEngine, pass .sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def slow_queries() -> list:
+    return list(_slow_queries)
+
+
+class SQLProfileMiddleware:
+    """Pure ASGI middleware, so the profile contextvar is visible to the endpoint's task."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(scope)
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", profile.server_timing().encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            if profile.count:
+                logger.info(
+                    "%s %d queries %.1fms %s", profile.route, profile.count, profile.total * 1000,
+                    " ".join(f"{function}={count}/{total * 1000:.1f}ms" for function, (count, total) in profile.functions.items()),
+                )
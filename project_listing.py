@@ -0,0 +1,84 @@
+"""JSON encoding for GET /projects/: field selection, opt-in nested tasks and streaming.
+
+Without a limit the endpoint streams every project of the owner, fetching them in
+keyset batches of PROJECT_STREAM_BATCH and writing each batch out as soon as it is
+serialized, so neither the rows nor the JSON document are held in memory at once.
+"""
+from typing import Optional, Set
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+import async_crud
+from crud import session_scope
+from schemas import ProjectResponse, ProjectSummary
+
+PROJECT_STREAM_BATCH = 100
+PROJECT_PAGE_MAX = 500
+EXPANDABLE = {"tasks"}
+
+
+def parse_expand(expand: Optional[str]) -> Set[str]:
+    requested = {part.strip() for part in (expand or "").split(",") if part.strip()}
+    unknown = requested - EXPANDABLE
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot expand: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def parse_fields(fields: Optional[str], schema) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    requested = {part.strip() for part in fields.split(",") if part.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def project_schema(expanded: Set[str]):
+    return ProjectResponse if "tasks" in expanded else ProjectSummary
+
+
+def encode_project(project, schema, include: Optional[Set[str]]) -> bytes:
+    return schema.model_validate(project, from_attributes=True).model_dump_json(include=include).encode()
+
+
+def encode_projects(projects, schema, include: Optional[Set[str]]) -> bytes:
+    return b"[" + b",".join(encode_project(project, schema, include) for project in projects) + b"]"
+
+
+async def stream_projects(owner_id: int, after_id: Optional[int], expanded: Set[str], include: Optional[Set[str]]):
+    # Runs after the request's dependencies have exited, so it needs a session of its own.
+    # The first chunk is only yielded once the first batch has encoded (see streaming_response).
+    schema = project_schema(expanded)
+    async with session_scope() as db:
+        opening = b"["
+        while True:
+            projects = await async_crud.get_projects_by_owner(
+                db, owner_id, limit=PROJECT_STREAM_BATCH, after_id=after_id, expand_tasks="tasks" in expanded
+            )
+            if projects:
+                yield opening + b",".join(encode_project(project, schema, include) for project in projects)
+                opening = b","
+            if len(projects) < PROJECT_STREAM_BATCH:
+                break
+            after_id = projects[-1].id
+            # Encoded rows are done with; keep the identity map from growing with the stream.
+            db.expunge_all()
+        yield b"]" if opening == b"," else b"[]"
+
+
+async def streaming_response(owner_id: int, after_id: Optional[int], expanded: Set[str], include: Optional[Set[str]]) -> StreamingResponse:
+    """Start the stream only after its first chunk is ready.
+
+    StreamingResponse sends the status line before iterating the body, so a failure in the
+    first batch would otherwise surface as a 200 with a truncated body instead of an error.
+    """
+    body = stream_projects(owner_id, after_id, expanded, include)
+    first = await body.__anext__()
+
+    async def chunks():
+        yield first
+        async for chunk in body:
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type="application/json")
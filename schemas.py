@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import date
-from typing import List, Optional, ForwardRef
+from typing import Dict, List, Optional, ForwardRef
 from datetime import datetime, timedelta
 from pydantic import BaseModel, EmailStr
 
@@ -75,6 +75,12 @@ class TaskListResponse(TaskListBase):
     class Config:
         orm_mode = True
 
+class TaskListSummary(TaskListBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
 
 
 class TaskBase(BaseModel):
@@ -87,6 +93,26 @@ class TaskCreate(TaskBase):
 class TaskUpdate(TaskBase):
     root_task_id: Optional[int] = None
 
+class BulkTaskItem(TaskBase):
+    # temp_id is client-chosen; parent_temp_id points at another item of the same request,
+    # root_task_id at a task that already exists in the project (at most one of the two).
+    temp_id: str
+    parent_temp_id: Optional[str] = None
+    root_task_id: Optional[int] = None
+
+class BulkTaskCreate(BaseModel):
+    tasks: List[BulkTaskItem]
+
+class BulkTaskResponse(BaseModel):
+    ids: Dict[str, int]
+
+class TaskForestResponse(BaseModel):
+    # Parallel arrays, one entry per task; parent_ids is null for top-level tasks.
+    version: int
+    ids: List[int]
+    parent_ids: List[Optional[int]]
+    names: List[Optional[str]]
+
 # class TaskResponse(TaskBase):
 #     id: int
 #     project_id: int
@@ -122,7 +148,15 @@ class ProjectCreate(ProjectBase):
 class ProjectResponse(ProjectBase):
     id: int
     owner_id: int
-    tasks: List[TaskResponse] = []
+    # Project.tasks is the project's task lists (models.TaskList), not its Task rows.
+    tasks: List[TaskListSummary] = []
+
+    class Config:
+        orm_mode = True
+
+class ProjectSummary(ProjectBase):
+    id: int
+    owner_id: int
 
     class Config:
         orm_mode = True
@@ -133,4 +167,33 @@ class CommentResponse(BaseModel):
     comment:str
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TaskCommentsBatch(BaseModel):
+    comments: Dict[int, List[CommentResponse]]
+
+class TaskCommentCounts(BaseModel):
+    counts: Dict[int, int]
+
+class BulkCommentItem(BaseModel):
+    task_id: int
+    comment: str
+
+class BulkCommentCreate(BaseModel):
+    comments: List[BulkCommentItem]
+
+class BulkCommentResponse(BaseModel):
+    ids: List[int]
+
+class SearchHit(BaseModel):
+    kind: str  # "task" or "comment"
+    id: int
+    task_id: int
+    project_id: int
+    task_name: Optional[str] = None
+    comment: Optional[str] = None
+    rank: float
+
+class TypeaheadHit(BaseModel):
+    id: int
+    name: Optional[str] = None
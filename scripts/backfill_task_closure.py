@@ -0,0 +1,54 @@
+"""Build the task_closure table for existing projects, a batch of projects per transaction.
+
+Run once from the repository root, after `python migrate.py upgrade` and before setting
+TASK_CLOSURE_ENABLED; task writes keep the table current from then on, flag or no flag:
+
+    python -m scripts.backfill_task_closure --batch-size 100
+    python -m scripts.backfill_task_closure --project-id 7 --project-id 9
+"""
+import argparse
+
+from sqlalchemy import select
+
+import crud
+from database import SessionLocal
+from models import Project
+
+
+def project_batches(db, batch_size, project_ids=None):
+    if project_ids:
+        for start in range(0, len(project_ids), batch_size):
+            yield project_ids[start:start + batch_size]
+        return
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Project.id).where(Project.id > last_id).order_by(Project.id).limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100, help="projects rebuilt per transaction")
+    parser.add_argument("--project-id", type=int, action="append", dest="project_ids", help="only rebuild these projects")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = 0
+        for batch in project_batches(db, args.batch_size, args.project_ids):
+            written = crud.rebuild_task_closure(db, batch)
+            db.commit()
+            total += written
+            print(f"projects {batch[0]}..{batch[-1]}: {written} closure rows")
+        print(f"done: {total} closure rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
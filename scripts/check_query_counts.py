@@ -0,0 +1,142 @@
+"""Query-count regression check: list endpoints must not issue per-row (N+1) queries.
+
+    python -m scripts.check_query_counts
+
+Seeds a throwaway SQLite database at two sizes and calls every list endpoint through
+the app. Each endpoint must issue the same number of statements at both sizes, and no
+more than its budget. Exits 1 on failure.
+"""
+import os
+import sys
+import tempfile
+import warnings
+from contextlib import contextmanager
+from datetime import date
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_counts.db"
+os.environ["USE_ASYNC_DB"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import crud
+import migrations
+import models
+from database import SessionLocal, engine
+
+SMALL, LARGE = 3, 30
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(bind=engine):
+    counter = QueryCounter()
+    event.listen(bind, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(limit: int, bind=engine):
+    """Fail if the block issues more than limit statements."""
+    with count_queries(bind) as counter:
+        yield counter
+    if len(counter) > limit:
+        raise AssertionError(f"{len(counter)} statements, expected at most {limit}:\n  " + "\n  ".join(counter.statements))
+
+
+def seed(size: int) -> dict:
+    """A user owning size projects with one task list each, plus a board with size milestones/tasklists/tasks."""
+    db = SessionLocal()
+    suffix = str(size)
+    owner = models.User(email=f"owner{suffix}@example.com", username=f"owner{suffix}", phonenumber=suffix, hashed_password="x")
+    db.add(owner)
+    db.flush()
+    # Task lists on every listed project, so expand=tasks has something to expand at both sizes.
+    for i in range(size):
+        project = models.Project(projectname=f"p{i}", description="", due_date=date(2024, 1, 1), owner_id=owner.id)
+        db.add(project)
+        db.flush()
+        milestone = models.Milestone(milestone_name="m", start_date=date(2024, 1, 1), end_date=date(2024, 2, 1), project_id=project.id)
+        db.add(milestone)
+        db.flush()
+        db.add(models.TaskList(task_name="tl", milestone_id=milestone.id, project_id=project.id))
+    board = models.Project(projectname="board", description="", due_date=date(2024, 1, 1), owner_id=owner.id)
+    db.add(board)
+    db.flush()
+    task_ids = []
+    for i in range(size):
+        milestone = models.Milestone(milestone_name=f"m{i}", start_date=date(2024, 1, 1), end_date=date(2024, 2, 1), project_id=board.id)
+        db.add(milestone)
+        db.flush()
+        db.add(models.TaskList(task_name=f"tl{i}", milestone_id=milestone.id, project_id=board.id))
+        task = models.Task(task_name=f"t{i}", task_details="", project_id=board.id)
+        db.add(task)
+        db.flush()
+        task_ids.append(task.id)
+        db.add(models.Comment(comment="c", type_id=task.id, type_name="task"))
+    data = {"email": owner.email, "board": board.id, "task_ids": ",".join(map(str, task_ids)), "size": size}
+    db.commit()
+    db.close()
+    return data
+
+
+# (name, url template, statement budget for one request, including a user-cache miss)
+ENDPOINTS = [
+    ("projects (page)", "/projects/?limit={size}", 3),
+    ("projects (page, expand=tasks)", "/projects/?limit={size}&expand=tasks", 3),
+    ("projects (stream)", "/projects/", 2),
+    ("projects (stream, expand=tasks)", "/projects/?expand=tasks", 3),
+    ("milestones", "/projects/{board}/milestones/?limit={size}", 1),
+    ("tasklists", "/projects/{board}/tasklists/?limit={size}", 1),
+    ("comments batch", "/projects/{board}/comments?task_ids={task_ids}", 2),
+    ("comment counts", "/projects/{board}/comments/counts?task_ids={task_ids}", 2),
+]
+# Endpoints whose response must actually carry expanded task lists.
+EXPANDED = {"projects (page, expand=tasks)", "projects (stream, expand=tasks)"}
+
+
+def main() -> int:
+    warnings.filterwarnings("ignore")
+    migrations.upgrade(engine, log=lambda message: None)
+    import main as app_module
+
+    client = TestClient(app_module.app)
+    datasets = [seed(SMALL), seed(LARGE)]
+    failures = 0
+    for name, template, budget in ENDPOINTS:
+        counts = []
+        ok = True
+        for data in datasets:
+            headers = {"Authorization": "Bearer " + crud.create_access_token({"sub": data["email"]})}
+            try:
+                with assert_max_queries(budget) as counter:
+                    response = client.get(template.format(**data), headers=headers)
+            except AssertionError as exc:
+                ok = False
+                print(f"     {name}: {exc}")
+            if response.status_code != 200:
+                raise AssertionError(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+            if name in EXPANDED and not all(project["tasks"] for project in response.json() if project["projectname"] != "board"):
+                raise AssertionError(f"{name}: task lists missing from the expanded projects")
+            counts.append(len(counter))
+        ok = ok and counts[0] == counts[1]
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {counts[0]} statements at {SMALL} rows, {counts[1]} at {LARGE} (budget {budget})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
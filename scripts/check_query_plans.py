@@ -0,0 +1,62 @@
+"""Query-plan regression check: every hot query in crud.py must be served by its index.
+
+    python -m scripts.check_query_plans                 # throwaway SQLite database, migrated to head
+    DATABASE_URL=postgresql://... python -m scripts.check_query_plans
+
+On PostgreSQL sequential scans are disabled for the session, so the check verifies
+that a matching index exists and is usable even on small tables. Exits 1 on failure.
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/query_plans.db")
+
+from sqlalchemy import select, text
+
+import migrations
+from database import engine
+from models import Comment, Milestone, Project, Task, TaskList, User
+import typeahead
+
+# (description, statement, index names any one of which must appear in the plan)
+HOT_QUERIES = [
+    ("get_user", select(User).where(User.email == "a@example.com"), {"ix_users_email"}),
+    ("get_task_comments", select(Comment).where(Comment.type_id == 1, Comment.type_name == "task"), {"ix_comments_type_id_type_name"}),
+    ("get_task", select(Task).where(Task.project_id == 1, Task.id == 1), {"ix_tasks_project_id_id", "tasks_pkey", "INTEGER PRIMARY KEY"}),
+    ("get_task_descendants step", select(Task.id).where(Task.project_id == 1, Task.root_task_id == 1), {"ix_tasks_root_task_id"}),
+    ("get_milestones_by_project", select(Milestone).where(Milestone.project_id == 1, Milestone.id > 0).order_by(Milestone.id).limit(10), {"ix_milestones_project_id_id"}),
+    ("get_tasklists_by_project", select(TaskList).where(TaskList.project_id == 1, TaskList.id > 0).order_by(TaskList.id).limit(10), {"ix_task_lists_project_id_id"}),
+    ("get_projects_by_owner", select(Project).where(Project.owner_id == 1, Project.id > 0).order_by(Project.id).limit(10), {"ix_projects_owner_id_id"}),
+    ("typeahead.lookup_tasks", typeahead.task_prefix_statement(1, "des", 10, engine.dialect.name), {"ix_tasks_project_id_lower_task_name"}),
+    ("typeahead.lookup_projects", typeahead.project_prefix_statement(1, "des", 10, engine.dialect.name), {"ix_projects_owner_id_lower_projectname"}),
+]
+
+
+def explain(conn, statement) -> str:
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "postgresql":
+        return "\n".join(row[0] for row in conn.execute(text("EXPLAIN " + sql)))
+    # SQLite: "SEARCH milestones USING INDEX ix_milestones_project_id_id (project_id=? AND id>?)"
+    return "\n".join(str(row[-1]) for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+def main() -> int:
+    if engine.dialect.name == "sqlite":
+        migrations.upgrade(engine, log=lambda message: None)
+    failures = 0
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        for name, statement, indexes in HOT_QUERIES:
+            plan = explain(conn, statement)
+            ok = any(index in plan for index in indexes)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: expected {' or '.join(sorted(indexes))}")
+            if not ok:
+                print("     " + plan.replace("\n", "\n     "))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
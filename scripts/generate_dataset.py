@@ -0,0 +1,282 @@
+"""Populate the database with a synthetic, seeded dataset of realistic project shapes.
+
+Run from the repository root against a migrated database (ideally an empty one):
+
+    python -m scripts.generate_dataset --scale 1k
+    python -m scripts.generate_dataset --scale 10m --seed 7
+    python -m scripts.generate_dataset --users 50 --tasks 400 --fanout 2 --max-depth 12
+
+--scale picks a preset of roughly 1k, 100k, 1m or 10m rows in total; the other options
+override single knobs of it. Each project gets a log-normally distributed number of
+tasks (--tasks is the mean, --task-skew the spread), grown breadth-first into
+root_task_id trees: --root-fraction of them are roots, every other task's children are
+drawn from --fanout-dist with mean --fanout, shrinking by --depth-decay per level, and
+no tree goes deeper than --max-depth. Comments per task are geometric with mean
+--comments.
+
+Ids are assigned here, continuing after the current maximum of each table, so rows
+stream parents-first in one pass: COPY on PostgreSQL (sequences are moved past the new
+ids afterwards), executemany elsewhere. The same seed on the same (empty) database gives
+the same rows. Afterwards the full-text index is filled for the new tasks and comments
+and task_closure is rebuilt for the new projects (--no-closure skips it, leaving them
+for scripts/backfill_task_closure.py).
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+import crud
+import search
+from database import SessionLocal, engine
+from hashing import pwd_context
+
+PRESETS = {
+    # users, projects per user, milestones per project, task lists per milestone, tasks per project, comments per task
+    "1k": dict(users=10, projects=2, milestones=2, tasklists=2, tasks=30, comments=0.8),
+    "100k": dict(users=200, projects=5, milestones=3, tasklists=2, tasks=45, comments=0.8),
+    "1m": dict(users=1000, projects=10, milestones=4, tasklists=2, tasks=45, comments=0.8),
+    "10m": dict(users=5000, projects=20, milestones=4, tasklists=2, tasks=45, comments=0.8),
+}
+
+# Table -> inserted columns, in foreign-key order (parents are always flushed first).
+COLUMNS = {
+    "users": ("id", "email", "username", "phonenumber", "hashed_password"),
+    "projects": ("id", "projectname", "description", "due_date", "owner_id"),
+    "milestones": ("id", "milestone_name", "start_date", "end_date", "project_id"),
+    "task_lists": ("id", "task_name", "milestone_id", "project_id"),
+    "tasks": ("id", "task_name", "task_details", "project_id", "root_task_id"),
+    "comments": ("id", "type_name", "type_id", "comment"),
+}
+
+VERBS = ["design", "build", "review", "deploy", "test", "document", "migrate", "refactor", "monitor", "plan", "fix", "ship"]
+NOUNS = ["api", "backend", "frontend", "database", "auth", "billing", "search", "dashboard", "pipeline", "cache", "reports", "onboarding"]
+WORDS = ["blocked", "done", "needs", "review", "waiting", "on", "deploy", "keys", "looks", "good", "merged", "retry", "flaky", "tests", "customer", "feedback"]
+
+
+class Writer:
+    """Buffers generated rows per table and flushes them, parents first, in batches."""
+
+    def __init__(self, connection, batch_size: int):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.postgres = connection.dialect.name == "postgresql"
+        self.rows = {table: [] for table in COLUMNS}
+        self.buffered = 0
+        self.written = {table: 0 for table in COLUMNS}
+
+    def add(self, table: str, row: tuple):
+        self.rows[table].append(row)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self.rows.items():
+            if not rows:
+                continue
+            if self.postgres:
+                self._copy(table, rows)
+            else:
+                self._executemany(table, rows)
+            self.written[table] += len(rows)
+            rows.clear()
+        self.connection.commit()
+        self.buffered = 0
+
+    def _copy(self, table, rows):
+        # CSV COPY: an unquoted empty field is NULL, which is how csv writes None.
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = self.connection.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    def _executemany(self, table, rows):
+        placeholders = ", ".join(["?" if self.connection.dialect.paramstyle == "qmark" else "%s"] * len(COLUMNS[table]))
+        self.connection.exec_driver_sql(f"INSERT INTO {table} ({', '.join(COLUMNS[table])}) VALUES ({placeholders})", rows)
+
+
+class Generator:
+    def __init__(self, args, first_ids):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.next_ids = dict(first_ids)
+        self.hashed_password = pwd_context.hash(args.password)
+        # log-normal with the requested mean: mean = exp(mu + sigma^2 / 2)
+        self.task_mu = math.log(max(args.tasks, 1)) - args.task_skew ** 2 / 2
+        self.project_ids = []
+        self.task_range = None
+        self.comment_range = None
+
+    def new_id(self, table):
+        value = self.next_ids[table]
+        self.next_ids[table] = value + 1
+        return value
+
+    def geometric(self, mean: float) -> int:
+        # Number of failures before a success with p = 1 / (mean + 1); mean as requested.
+        if mean <= 0:
+            return 0
+        return int(math.log(1 - self.rng.random()) / math.log(mean / (mean + 1)))
+
+    def children(self, depth: int) -> int:
+        if depth + 1 >= self.args.max_depth:
+            return 0
+        mean = self.args.fanout * self.args.depth_decay ** depth
+        if self.args.fanout_dist == "fixed":
+            return int(round(mean))
+        if self.args.fanout_dist == "poisson":
+            # Knuth's method; means here are small.
+            limit, count, product = math.exp(-mean), 0, self.rng.random()
+            while product > limit:
+                count += 1
+                product *= self.rng.random()
+            return count
+        return self.geometric(mean)
+
+    def name(self) -> str:
+        return f"{self.rng.choice(VERBS)} {self.rng.choice(NOUNS)}"
+
+    def sentence(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def generate(self, writer: Writer):
+        args, rng = self.args, self.rng
+        first_task, first_comment = self.next_ids["tasks"], self.next_ids["comments"]
+        start_day = date(2024, 1, 1)
+        for _ in range(args.users):
+            user_id = self.new_id("users")
+            writer.add("users", (user_id, f"user{user_id}@example.com", f"user{user_id}", f"+1555{user_id:09d}", self.hashed_password))
+            for _ in range(args.projects):
+                project_id = self.new_id("projects")
+                self.project_ids.append(project_id)
+                due = start_day + timedelta(days=rng.randrange(30, 720))
+                writer.add("projects", (project_id, f"{self.name()} {project_id}", self.sentence(8), due, user_id))
+                for m in range(args.milestones):
+                    milestone_id = self.new_id("milestones")
+                    begins = start_day + timedelta(days=30 * m)
+                    writer.add("milestones", (milestone_id, f"milestone {m + 1}", begins, begins + timedelta(days=30), project_id))
+                    for _ in range(args.tasklists):
+                        writer.add("task_lists", (self.new_id("task_lists"), self.name(), milestone_id, project_id))
+                self.generate_tasks(writer, project_id)
+        self.task_range = (first_task, self.next_ids["tasks"] - 1)
+        self.comment_range = (first_comment, self.next_ids["comments"] - 1)
+
+    def generate_tasks(self, writer: Writer, project_id: int):
+        args, rng = self.args, self.rng
+        budget = max(1, int(round(rng.lognormvariate(self.task_mu, args.task_skew))))
+        roots = max(1, int(round(budget * args.root_fraction)))
+        # Breadth-first, so every parent is written (and gets its id) before its children.
+        queue = [(None, -1)] * roots
+        head = 0
+        while budget > 0:
+            if head == len(queue):
+                # Every tree stopped growing before the budget ran out: start another one.
+                queue.append((None, -1))
+            parent_id, depth = queue[head]
+            head += 1
+            count = 1 if parent_id is None else self.children(depth)
+            for _ in range(min(count, budget)):
+                task_id = self.new_id("tasks")
+                writer.add("tasks", (task_id, self.name(), self.sentence(rng.randrange(4, 16)), project_id, parent_id))
+                queue.append((task_id, depth + 1))
+                budget -= 1
+                for _ in range(self.geometric(args.comments)):
+                    writer.add("comments", (self.new_id("comments"), "task", task_id, self.sentence(rng.randrange(3, 12))))
+
+
+def next_ids(connection) -> dict:
+    return {table: connection.execute(text(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")).scalar() for table in COLUMNS}
+
+
+def reset_sequences(connection):
+    for table in COLUMNS:
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))"
+        ))
+    connection.commit()
+
+
+def id_chunks(first: int, last: int, size: int):
+    for start in range(first, last + 1, size):
+        yield list(range(start, min(start + size, last + 1)))
+
+
+def build_indexes(generator: Generator, args):
+    db = SessionLocal()
+    try:
+        if args.search_index:
+            for task_ids in id_chunks(*generator.task_range, args.index_chunk):
+                search.index_tasks(db, task_ids)
+                db.commit()
+            for comment_ids in id_chunks(*generator.comment_range, args.index_chunk):
+                search.index_comments(db, comment_ids)
+                db.commit()
+            print("search index: done")
+        if args.closure:
+            written = 0
+            for start in range(0, len(generator.project_ids), args.closure_batch):
+                written += crud.rebuild_task_closure(db, generator.project_ids[start:start + args.closure_batch])
+                db.commit()
+            print(f"task_closure: {written} rows")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(PRESETS), default="1k", help="preset for the row counts below")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--projects", type=int, help="per user")
+    parser.add_argument("--milestones", type=int, help="per project")
+    parser.add_argument("--tasklists", type=int, help="per milestone")
+    parser.add_argument("--tasks", type=float, help="mean tasks per project")
+    parser.add_argument("--task-skew", type=float, default=1.0, help="sigma of the log-normal tasks-per-project distribution")
+    parser.add_argument("--comments", type=float, help="mean comments per task")
+    parser.add_argument("--root-fraction", type=float, default=0.1, help="share of a project's tasks that are roots")
+    parser.add_argument("--fanout", type=float, default=3.0, help="mean children per task at depth 0")
+    parser.add_argument("--fanout-dist", choices=("geometric", "poisson", "fixed"), default="geometric")
+    parser.add_argument("--depth-decay", type=float, default=0.8, help="fan-out multiplier per level")
+    parser.add_argument("--max-depth", type=int, default=8, help="levels per tree, roots included")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--password", default="password", help="password of every generated user")
+    parser.add_argument("--batch-size", type=int, default=50000, help="rows buffered per flush/commit")
+    parser.add_argument("--index-chunk", type=int, default=5000, help="ids per full-text indexing statement")
+    parser.add_argument("--closure-batch", type=int, default=100, help="projects per task_closure rebuild")
+    parser.add_argument("--no-search-index", dest="search_index", action="store_false", help="skip filling the full-text index")
+    parser.add_argument("--closure", action=argparse.BooleanOptionalAction, default=True, help="rebuild task_closure")
+    args = parser.parse_args()
+    for knob, value in PRESETS[args.scale].items():
+        if getattr(args, knob) is None:
+            setattr(args, knob, value)
+
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+        generator = Generator(args, next_ids(connection))
+        writer = Writer(connection, args.batch_size)
+        generator.generate(writer)
+        writer.flush()
+        if writer.postgres:
+            reset_sequences(connection)
+    elapsed = time.perf_counter() - started
+    total = sum(writer.written.values())
+    for table, count in writer.written.items():
+        print(f"{table:<12}{count:>12}")
+    print(f"{'total':<12}{total:>12} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    build_indexes(generator, args)
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
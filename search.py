@@ -0,0 +1,120 @@
+"""Full-text search over task names/details and task comments.
+
+PostgreSQL keeps tsvector columns (tasks.search_vector, comments.search_vector) behind
+GIN indexes; SQLite, for local runs and the check scripts, keeps FTS5 tables
+(task_search, comment_search) whose rowid is the task or comment id. Both are created by
+migration 0006 and written by crud.py in the same transaction as the rows they index.
+"""
+import os
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "english")
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _ids(statement: str):
+    return text(statement).bindparams(bindparam("ids", expanding=True))
+
+
+def index_tasks(db: Session, task_ids: List[int]):
+    """(Re)index the given tasks from their current task_name/task_details."""
+    if not task_ids:
+        return
+    if _dialect(db) == "postgresql":
+        db.execute(_ids(
+            "UPDATE tasks SET search_vector = to_tsvector(CAST(:config AS regconfig), "
+            "coalesce(task_name, '') || ' ' || coalesce(task_details, '')) WHERE id IN :ids"
+        ), {"config": SEARCH_TEXT_CONFIG, "ids": list(task_ids)})
+        return
+    unindex_tasks(db, task_ids)
+    db.execute(_ids(
+        "INSERT INTO task_search (rowid, task_name, task_details) SELECT id, task_name, task_details FROM tasks WHERE id IN :ids"
+    ), {"ids": list(task_ids)})
+
+
+def unindex_tasks(db: Session, task_ids: List[int]):
+    # On PostgreSQL the vector is a column of the deleted row, so there is nothing to do.
+    if task_ids and _dialect(db) != "postgresql":
+        db.execute(_ids("DELETE FROM task_search WHERE rowid IN :ids"), {"ids": list(task_ids)})
+
+
+def index_comments(db: Session, comment_ids: List[int]):
+    if not comment_ids:
+        return
+    if _dialect(db) == "postgresql":
+        db.execute(_ids(
+            "UPDATE comments SET search_vector = to_tsvector(CAST(:config AS regconfig), coalesce(comment, '')) WHERE id IN :ids"
+        ), {"config": SEARCH_TEXT_CONFIG, "ids": list(comment_ids)})
+        return
+    db.execute(_ids("INSERT INTO comment_search (rowid, comment) SELECT id, comment FROM comments WHERE id IN :ids"), {"ids": list(comment_ids)})
+
+
+def fts5_query(query: str) -> str:
+    # Every word becomes a quoted FTS5 string, so user input cannot inject query syntax.
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+# Both branches return (kind, id, task_id, project_id, task_name, comment, rank), higher rank first.
+POSTGRES_SEARCH = """
+WITH q AS (SELECT websearch_to_tsquery(CAST(:config AS regconfig), :query) AS query)
+SELECT kind, id, task_id, project_id, task_name, comment, rank FROM (
+    SELECT 'task' AS kind, t.id AS id, t.id AS task_id, t.project_id AS project_id, t.task_name AS task_name,
+           NULL AS comment, ts_rank(t.search_vector, q.query) AS rank
+    FROM q, tasks t JOIN projects p ON p.id = t.project_id
+    WHERE t.search_vector @@ q.query AND p.owner_id = :owner_id {project_filter}
+    UNION ALL
+    SELECT 'comment', c.id, t.id, t.project_id, t.task_name, c.comment, ts_rank(c.search_vector, q.query)
+    FROM q, comments c
+    JOIN tasks t ON c.type_name = 'task' AND t.id = c.type_id
+    JOIN projects p ON p.id = t.project_id
+    WHERE c.search_vector @@ q.query AND p.owner_id = :owner_id {project_filter}
+) hits
+ORDER BY rank DESC, kind DESC, id
+LIMIT :limit OFFSET :skip
+"""
+
+SQLITE_SEARCH = """
+SELECT kind, id, task_id, project_id, task_name, comment, rank FROM (
+    SELECT 'task' AS kind, t.id AS id, t.id AS task_id, t.project_id AS project_id, t.task_name AS task_name,
+           NULL AS comment, -bm25(task_search) AS rank
+    FROM task_search
+    JOIN tasks t ON t.id = task_search.rowid
+    JOIN projects p ON p.id = t.project_id
+    WHERE task_search MATCH :query AND p.owner_id = :owner_id {project_filter}
+    UNION ALL
+    SELECT 'comment', c.id, t.id, t.project_id, t.task_name, c.comment, -bm25(comment_search)
+    FROM comment_search
+    JOIN comments c ON c.id = comment_search.rowid
+    JOIN tasks t ON c.type_name = 'task' AND t.id = c.type_id
+    JOIN projects p ON p.id = t.project_id
+    WHERE comment_search MATCH :query AND p.owner_id = :owner_id {project_filter}
+) hits
+ORDER BY rank DESC, kind DESC, id
+LIMIT :limit OFFSET :skip
+"""
+
+
+def search(db: Session, owner_id: int, query: str, project_id: Optional[int] = None, skip: int = 0, limit: int = DEFAULT_SEARCH_LIMIT):
+    """Ranked task and comment hits in projects owned by owner_id."""
+    if not query.split():
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    params = {"owner_id": owner_id, "skip": skip, "limit": limit}
+    project_filter = ""
+    if project_id is not None:
+        project_filter = "AND t.project_id = :project_id"
+        params["project_id"] = project_id
+    if _dialect(db) == "postgresql":
+        statement = POSTGRES_SEARCH
+        params.update(config=SEARCH_TEXT_CONFIG, query=query)
+    else:
+        statement = SQLITE_SEARCH
+        params["query"] = fts5_query(query)
+    return db.execute(text(statement.format(project_filter=project_filter)), params).all()
@@ -0,0 +1,175 @@
+"""Cache of each project's task forest as compact parent-pointer arrays.
+
+A snapshot holds parallel arrays (task ids, parent ids with 0 for roots, names) labelled
+with projects.tasks_version. Every task write bumps that counter in its own transaction
+(record_change) and, once committed, patches the local snapshot from version N-1 to N
+instead of rebuilding it; a snapshot at any other version is dropped. Readers compare
+the label with the database's tasks_version, so a worker that missed a patch reloads.
+The Redis copy is not patched: the commit hook may run on the event loop (AsyncSession
+commits go through run_sync), so it makes no Redis round trips. The outdated shared
+copy fails the version check, and the next reader rebuilds it and stores it again.
+
+A per-process tier is always on; TASK_FOREST_REDIS_URL adds a shared Redis tier.
+"""
+import json
+import os
+from array import array
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+import models
+from ttl_cache import TTLCache
+
+TASK_FOREST_CACHE_SIZE = int(os.getenv("TASK_FOREST_CACHE_SIZE", "256"))
+TASK_FOREST_CACHE_TTL = float(os.getenv("TASK_FOREST_CACHE_TTL", "3600"))
+TASK_FOREST_REDIS_URL = os.getenv("TASK_FOREST_REDIS_URL")
+REDIS_KEY_PREFIX = "task_forest:"
+
+
+class TaskForest:
+    """Immutable snapshot; patched() returns a new one, so readers never see a half-applied patch."""
+
+    __slots__ = ("version", "ids", "parent_ids", "names")
+
+    def __init__(self, version: int, ids, parent_ids, names):
+        self.version = version
+        self.ids = array("q", ids)
+        self.parent_ids = array("q", parent_ids)
+        self.names = list(names)
+
+    @classmethod
+    def from_rows(cls, version: int, rows):
+        rows = list(rows)
+        return cls(version, (row.id for row in rows), (row.root_task_id or 0 for row in rows), (row.task_name for row in rows))
+
+    def patched(self, version: int, ops):
+        ids, parent_ids, names = list(self.ids), list(self.parent_ids), list(self.names)
+        index = {task_id: position for position, task_id in enumerate(ids)}
+        for op in ops:
+            kind = op[0]
+            if kind == "add":
+                for task_id, parent_id, name in op[1]:
+                    index[task_id] = len(ids)
+                    ids.append(task_id)
+                    parent_ids.append(parent_id or 0)
+                    names.append(name)
+            elif kind == "move":
+                parent_ids[index[op[1]]] = op[2] or 0
+            elif kind == "rename":
+                names[index[op[1]]] = op[2]
+            elif kind == "remove":
+                removed = set(op[1])
+                kept = [position for position, task_id in enumerate(ids) if task_id not in removed]
+                ids = [ids[position] for position in kept]
+                parent_ids = [parent_ids[position] for position in kept]
+                names = [names[position] for position in kept]
+                index = {task_id: position for position, task_id in enumerate(ids)}
+            else:
+                raise ValueError(f"Unknown task forest op {kind!r}")
+        return TaskForest(version, ids, parent_ids, names)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "ids": self.ids.tolist(),
+            "parent_ids": [parent_id or None for parent_id in self.parent_ids],
+            "names": self.names,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["version"], data["ids"], (parent_id or 0 for parent_id in data["parent_ids"]), data["names"])
+
+
+class TaskForestCache:
+    def __init__(self, maxsize: int = TASK_FOREST_CACHE_SIZE, ttl: float = TASK_FOREST_CACHE_TTL, redis_client=None):
+        self.configure(maxsize, ttl, redis_client)
+
+    def configure(self, maxsize: int = TASK_FOREST_CACHE_SIZE, ttl: float = TASK_FOREST_CACHE_TTL, redis_client=None):
+        self.local = TTLCache(maxsize, ttl)
+        self.redis = redis_client
+        self.ttl = ttl
+
+    async def get(self, project_id: int, version: int):
+        forest = self.local.get(project_id)
+        if forest is not None and forest.version == version:
+            return forest
+        if self.redis is None:
+            return None
+        raw = await run_in_threadpool(self.redis.get, REDIS_KEY_PREFIX + str(project_id))
+        if raw is None:
+            return None
+        forest = TaskForest.from_dict(json.loads(raw))
+        if forest.version != version:
+            return None
+        self.local.set(project_id, forest)
+        return forest
+
+    async def set(self, project_id: int, forest: TaskForest):
+        self.local.set(project_id, forest)
+        if self.redis is not None:
+            await run_in_threadpool(self._store, project_id, forest)
+
+    def _store(self, project_id: int, forest: TaskForest):
+        self.redis.set(REDIS_KEY_PREFIX + str(project_id), json.dumps(forest.to_dict()), ex=max(int(self.ttl), 1))
+
+    def patch(self, project_id: int, version: int, ops):
+        """Advance the local snapshot at version - 1 to version; drop any other version.
+
+        In-memory only, so it is safe to call from the event loop thread.
+        """
+        forest = self.local.get(project_id)
+        patched = self._patch(forest, version, ops)
+        if patched is None:
+            self.local.delete(project_id)
+        else:
+            self.local.set(project_id, patched)
+
+    @staticmethod
+    def _patch(forest, version: int, ops):
+        if forest is None or forest.version != version - 1:
+            return None
+        try:
+            return forest.patched(version, ops)
+        except (KeyError, ValueError):
+            return None
+
+
+def _redis_from_env():
+    if not TASK_FOREST_REDIS_URL:
+        return None
+    import redis
+    return redis.Redis.from_url(TASK_FOREST_REDIS_URL)
+
+
+task_forest_cache = TaskForestCache(redis_client=_redis_from_env())
+
+
+# Writers call record_change inside their transaction; the patches are applied once it
+# commits and discarded if it rolls back.
+PENDING_KEY = "task_forest_patches"
+
+def record_change(db: Session, project_id: int, ops):
+    """Bump projects.tasks_version and queue ops for the post-commit cache patch.
+
+    ops: ("add", [(id, parent_id, name), ...]), ("move", id, parent_id),
+    ("rename", id, name) or ("remove", [id, ...]).
+    """
+    version = db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(tasks_version=models.Project.tasks_version + 1)
+        .returning(models.Project.tasks_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if version is not None:
+        db.info.setdefault(PENDING_KEY, []).append((project_id, version, ops))
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_patches(session):
+    for project_id, version, ops in session.info.pop(PENDING_KEY, ()):
+        task_forest_cache.patch(project_id, version, ops)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_patches(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,119 @@
+"""Cache of users resolved by get_current_user, keyed by token subject (the email).
+
+Without Redis, entries live in a per-process TTL + LRU tier. A committed change to a
+user only clears the committing worker's copy; other workers may keep serving the old
+row for up to USER_CACHE_TTL seconds. Setting USER_CACHE_REDIS_URL replaces the local
+tier with a shared Redis one, so an invalidation is seen by every worker at once; tests
+can hand user_cache.configure() a fakeredis client instead.
+
+The Redis deletes never run inside the commit hook on the event loop (AsyncSession
+commits go through run_sync): they are queued on the session and crud.run_db sends them
+from the threadpool once the crud function returns, before the response goes out.
+Commits made off the loop (threadpool workers, scripts) delete straight away.
+"""
+import asyncio
+import json
+import os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+import models
+from ttl_cache import TTLCache
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+
+# Columns kept in the cache; the password hash never leaves the database.
+CACHED_USER_FIELDS = ("id", "email", "username", "phonenumber")
+REDIS_KEY_PREFIX = "user:"
+
+
+class UserCache:
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, redis_client=None):
+        self.configure(maxsize, ttl, redis_client)
+
+    def configure(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, redis_client=None):
+        # Replaces both tiers, e.g. to plug in a fakeredis client in tests.
+        self.local = TTLCache(maxsize, ttl)
+        self.redis = redis_client
+        self.ttl = ttl
+
+    # With Redis configured the local tier is bypassed: another worker's invalidation only
+    # reaches Redis, so a local copy could outlive it by a full TTL.
+    async def get(self, email: str):
+        if self.redis is None:
+            return self.local.get(email)
+        raw = await run_in_threadpool(self.redis.get, REDIS_KEY_PREFIX + email)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, email: str, user: dict):
+        if self.redis is None:
+            self.local.set(email, user)
+            return
+        await run_in_threadpool(self.redis.set, REDIS_KEY_PREFIX + email, json.dumps(user), ex=max(int(self.ttl), 1))
+
+    def invalidate(self, *emails: str):
+        """Blocking when Redis is configured; call it off the event loop."""
+        for email in emails:
+            self.local.delete(email)
+        if self.redis is not None and emails:
+            self.redis.delete(*(REDIS_KEY_PREFIX + email for email in emails))
+
+    async def flush_invalidations(self, session):
+        """Send the Redis deletes queued by commits that ran on the event loop."""
+        emails = session.info.pop(COMMITTED_KEY, None)
+        if emails:
+            await run_in_threadpool(self.invalidate, *emails)
+
+
+def user_snapshot(user: models.User) -> dict:
+    return {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+
+
+def _redis_from_env():
+    if not USER_CACHE_REDIS_URL:
+        return None
+    import redis
+    return redis.Redis.from_url(USER_CACHE_REDIS_URL)
+
+
+user_cache = UserCache(redis_client=_redis_from_env())
+
+
+# Invalidation: any flushed change to a User marks its email(s) on the session, and the
+# entries are dropped once that transaction commits.
+PENDING_KEY = "user_cache_invalidations"
+# Committed emails whose Redis deletes wait for flush_invalidations.
+COMMITTED_KEY = "user_cache_committed_invalidations"
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    emails = session.info.setdefault(PENDING_KEY, set())
+    emails.add(target.email)
+    emails.update(email for email in inspect(target).attrs.email.history.deleted if email)
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    emails = session.info.pop(PENDING_KEY, None)
+    if not emails:
+        return
+    if user_cache.redis is not None and _on_event_loop():
+        session.info.setdefault(COMMITTED_KEY, set()).update(emails)
+    else:
+        user_cache.invalidate(*emails)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_users(session):
+    session.info.pop(PENDING_KEY, None)